@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+import jdatetime
+from loguru import logger
+
+from src.fetch.aqi_fetcher import AQIDataFetcher
+
+from .common import load_benchmark_config
+from .stub_server import StubDOEServer
+
+
+def run(days: int, capacity: int, max_concurrent: int) -> dict:
+    start = jdatetime.date(1402, 1, 1)
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        StubDOEServer(capacity=capacity, overload_capacity=capacity * 2) as server,
+    ):
+        config = load_benchmark_config(
+            Path(tmp),
+            BASE_URL=server.url,
+            START_DATE=start.strftime("%Y/%m/%d"),
+            END_DATE=(start + timedelta(days=days - 1)).strftime("%Y/%m/%d"),
+            MAX_CONCURRENT=max_concurrent,
+            REQUEST_RATE=0,
+            SAVE_WORKERS=4,
+        )
+        fetcher = AQIDataFetcher(config)
+        asyncio.run(fetcher.fetch_all())
+        return {
+            "server": {
+                "requests": server.requests,
+                "errors": server.errors,
+                "max_in_flight": server.max_in_flight,
+            },
+            "limiter": fetcher.limiter.report(),
+            "fetch": fetcher.fetch_stats.report(),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--capacity", type=int, default=6)
+    parser.add_argument("--max-concurrent", type=int, default=32)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(json.dumps(run(args.days, args.capacity, args.max_concurrent), indent=2))
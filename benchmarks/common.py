@@ -0,0 +1,16 @@
+import os
+from dataclasses import replace
+from pathlib import Path
+
+from src.config import AppConfig
+
+
+def load_benchmark_config(work_dir: Path, **overrides) -> AppConfig:
+    data_dir = work_dir / "data"
+    os.environ["INPUT_DIR"] = str(data_dir)
+    os.environ["OUTPUT_DIR"] = str(data_dir)
+    os.environ["PLOTS_DIR"] = str(work_dir / "plots")
+    os.environ["FONT_REGULAR_PATH"] = "assets/fonts/Vazirmatn-Regular.ttf"
+    os.environ["FONT_BOLD_PATH"] = "assets/fonts/Vazirmatn-Bold.ttf"
+    config = AppConfig.load()
+    return replace(config, **overrides)
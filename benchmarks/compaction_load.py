@@ -0,0 +1,68 @@
+import argparse
+import json
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from loguru import logger
+
+from src.fetch.aqi_fetcher import decode_and_save
+from src.fetch.utils import build_output_path, generate_jalali_dates
+from src.process.compaction import compact_aqi_data
+from src.process.data_processor import _load_and_combine_data
+
+from .synthetic import generate_rows
+
+
+def write_archive(base_dir: Path, start: str, end: str, n_regions: int) -> int:
+    dates = generate_jalali_dates(start, end)
+    for date in dates:
+        raw = json.dumps({"Data": generate_rows(date, n_regions)}).encode()
+        key = (date, "11:00", 1)
+        decode_and_save(raw, key, build_output_path(base_dir, date))
+    return len(dates)
+
+
+def time_load(base_dir: Path, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        _load_and_combine_data(base_dir)
+        best = min(best, perf_counter() - started)
+    return best
+
+
+def run(start: str, end: str, n_regions: int, granularity: str, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        n_files = write_archive(base_dir, start, end, n_regions)
+        before = time_load(base_dir, repeat)
+
+        started = perf_counter()
+        compact_aqi_data(base_dir, granularity)
+        compaction_seconds = perf_counter() - started
+        after = time_load(base_dir, repeat)
+
+        return {
+            "daily_files": n_files,
+            "compacted_files": len(list(base_dir.rglob("*.parquet"))),
+            "granularity": granularity,
+            "compaction_seconds": round(compaction_seconds, 3),
+            "load_seconds_before": round(before, 4),
+            "load_seconds_after": round(after, 4),
+            "speedup": round(before / after, 1),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="1400/01/01")
+    parser.add_argument("--end", default="1402/12/29")
+    parser.add_argument("--regions", type=int, default=200)
+    parser.add_argument("--granularity", default="month")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    result = run(args.start, args.end, args.regions, args.granularity, args.repeat)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,149 @@
+import argparse
+import json
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from loguru import logger
+
+from src.fetch.utils import generate_jalali_dates
+from src.process.compaction import compact_aqi_data
+from src.process.episodes import (
+    BASELINE_DAYS,
+    BASELINE_MIN_DAYS,
+    EPISODE_BANDS,
+    JUMP_DELTA,
+    MIN_EPISODE_DAYS,
+    PARTIALS_FILE,
+    _finalize,
+    daily_series,
+    detect_episodes,
+    load_episodes,
+    update_episodes,
+)
+
+from .compaction_load import write_archive
+
+
+def loop_episodes(daily: pd.DataFrame) -> pd.DataFrame:
+    # Reference: one pass over every day with Python state per region
+    rows = []
+    one_day = pd.Timedelta(days=1)
+    for region_id, days in daily.groupby("region_id", sort=True):
+        history, open_runs = [], {}
+        for day in days.itertuples(index=False):
+            history = [
+                (date, aqi)
+                for date, aqi in history
+                if day.gregorian_date - date <= pd.Timedelta(days=BASELINE_DAYS)
+            ]
+            window = [aqi for _, aqi in history]
+            baseline = np.mean(window) if len(window) >= BASELINE_MIN_DAYS else np.nan
+            flags = {band: day.aqi > bound for band, bound in EPISODE_BANDS.items()}
+            flags[None] = day.aqi - baseline >= JUMP_DELTA
+            for band, flagged in flags.items():
+                run = open_runs.get(band)
+                if run is not None and (
+                    not flagged
+                    or day.gregorian_date - run[-1].gregorian_date != one_day
+                ):
+                    rows.append((band, run))
+                    run = open_runs[band] = None
+                if flagged:
+                    run = (run or []) + [day._replace(baseline=baseline)]
+                    open_runs[band] = run
+            history.append((day.gregorian_date, day.aqi))
+        rows.extend((band, run) for band, run in open_runs.items() if run)
+
+    episodes = []
+    for band, run in rows:
+        if band is not None and len(run) < MIN_EPISODE_DAYS:
+            continue
+        values = [day.aqi for day in run]
+        episodes.append(
+            {
+                "region_id": run[0].region_id,
+                "region_name_en": run[0].region_name_en,
+                "kind": "exceedance" if band is not None else "jump",
+                "band": band,
+                "start_date": run[0].gregorian_date,
+                "end_date": run[-1].gregorian_date,
+                "start_jalali_date": run[0].jalali_date,
+                "end_jalali_date": run[-1].jalali_date,
+                "days": len(run),
+                "peak_aqi": max(values),
+                "mean_aqi": sum(values) / len(values),
+                "baseline_aqi": run[0].baseline if band is None else np.nan,
+            }
+        )
+    return _finalize(pd.DataFrame(episodes))
+
+
+def run(start: str, end: str, n_regions: int, new_days: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp) / "data"
+        processed_dir = base_dir / "_processed"
+        write_archive(base_dir, start, end, n_regions)
+        # As the process stage leaves it before episodes are detected
+        compact_aqi_data(base_dir, "month")
+
+        started = perf_counter()
+        update_episodes(base_dir, processed_dir, Path(tmp) / "episodes")
+        build_seconds = perf_counter() - started
+
+        partials = pq.read_table(Path(tmp) / "episodes" / PARTIALS_FILE).to_pandas(
+            date_as_object=False
+        )
+        daily = daily_series(partials)
+        started = perf_counter()
+        vectorized = detect_episodes(daily)
+        detect_seconds = perf_counter() - started
+        started = perf_counter()
+        reference = loop_episodes(daily.assign(baseline=np.nan))
+        loop_seconds = perf_counter() - started
+        pd.testing.assert_frame_equal(vectorized, reference, check_dtype=False)
+
+        # New days land one at a time, as a daily fetch would add them
+        next_days = generate_jalali_dates(end, "1499/12/29")[1 : new_days + 1]
+        incremental_seconds = []
+        for day in next_days:
+            write_archive(base_dir, day, day, n_regions)
+            started = perf_counter()
+            update_episodes(base_dir, processed_dir, Path(tmp) / "episodes")
+            incremental_seconds.append(perf_counter() - started)
+
+        # The same archive detected from scratch
+        update_episodes(base_dir, processed_dir, Path(tmp) / "rebuilt")
+        incremental = load_episodes(Path(tmp) / "episodes")
+        pd.testing.assert_frame_equal(incremental, load_episodes(Path(tmp) / "rebuilt"))
+
+        return {
+            "regions": n_regions,
+            "region_days": len(daily),
+            "episodes": len(incremental),
+            "by_band": incremental["band"]
+            .astype(str)
+            .where(incremental["kind"] == "exceedance", "jump")
+            .value_counts()
+            .to_dict(),
+            "build_seconds": round(build_seconds, 3),
+            "detect_seconds": round(detect_seconds, 4),
+            "loop_seconds": round(loop_seconds, 3),
+            "speedup": round(loop_seconds / detect_seconds, 1),
+            "incremental_seconds": round(float(np.median(incremental_seconds)), 3),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="1401/01/01")
+    parser.add_argument("--end", default="1402/12/25")
+    parser.add_argument("--regions", type=int, default=400)
+    parser.add_argument("--new-days", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(json.dumps(run(args.start, args.end, args.regions, args.new_days), indent=2))
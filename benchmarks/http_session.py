@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import jdatetime
+from loguru import logger
+
+from src.fetch.aqi_fetcher import AQIDataFetcher
+from src.fetch.session import ATTEMPT_PHASES
+from src.metrics import METRICS
+
+from .common import load_benchmark_config
+from .stub_server import StubDOEServer
+
+# Connection reuse on (the default) and off, against the same stub
+SCENARIOS = {"keepalive": 30.0, "no_keepalive": 0.0}
+
+
+def _run(
+    keepalive_expiry: float,
+    days: int,
+    latency: float,
+    error_rate: float,
+    max_concurrent: int,
+    attempts: int,
+) -> dict:
+    METRICS.spans.clear()
+    METRICS.counters.clear()
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        StubDOEServer(
+            base_latency=latency,
+            capacity=max_concurrent,
+            overload_capacity=max_concurrent * 4,
+            error_rate=error_rate,
+        ) as server,
+    ):
+        config = load_benchmark_config(
+            Path(tmp),
+            BASE_URL=server.url,
+            START_DATE="1402/01/01",
+            END_DATE=(
+                jdatetime.date(1402, 1, 1) + jdatetime.timedelta(days=days - 1)
+            ).strftime("%Y/%m/%d"),
+            MAX_CONCURRENT=max_concurrent,
+            INITIAL_CONCURRENT=max_concurrent,
+            REQUEST_RATE=0,
+            REQUEST_ATTEMPTS=attempts,
+            KEEPALIVE_EXPIRY=keepalive_expiry,
+        )
+        fetcher = AQIDataFetcher(config)
+        started = perf_counter()
+        asyncio.run(fetcher.fetch_all())
+        seconds = perf_counter() - started
+
+    report = METRICS.report()
+    return {
+        "seconds": round(seconds, 3),
+        "requests": server.requests,
+        "server_errors": server.errors,
+        "server_connections": server.connections,
+        "client_connections": report["counters"].get("http_connections", 0),
+        # Never above REQUEST_ATTEMPTS: there is one retry budget per request
+        "max_attempts_per_date": max(server.requests_by_date.values()),
+        "manifest": fetcher.manifest.summary(),
+        "phases_mean_ms": {
+            name: round(report["spans"][name]["mean_seconds"] * 1000, 2)
+            for name in ATTEMPT_PHASES
+            if name in report["spans"]
+        },
+    }
+
+
+def run(
+    days: int, latency: float, error_rate: float, max_concurrent: int, attempts: int
+) -> dict:
+    return {
+        name: _run(expiry, days, latency, error_rate, max_concurrent, attempts)
+        for name, expiry in SCENARIOS.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    result = run(
+        args.days, args.latency, args.error_rate, args.max_concurrent, args.attempts
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,101 @@
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# What each CLI stage imports before doing any work
+STAGE_MODULES: Dict[str, List[str]] = {
+    "fetch": ["main", "src.fetch.aqi_fetcher", "src.fetch.backfill"],
+    "process": [
+        "main",
+        "src.process.compaction",
+        "src.process.processed_layer",
+        "src.process.analytics",
+        "src.process.summary_cube",
+        "src.process.episodes",
+    ],
+    "render": [
+        "main",
+        "src.process.processed_layer",
+        "src.visualize.yearly_report",
+        "src.visualize.overview",
+    ],
+}
+STAGE_MODULES["all"] = list(
+    dict.fromkeys(module for modules in STAGE_MODULES.values() for module in modules)
+)
+
+# Modules a stage must not pull in at all; timing varies between machines,
+# this does not
+FORBIDDEN: Dict[str, Tuple[str, ...]] = {
+    "fetch": ("pandas", "matplotlib"),
+    "process": ("matplotlib",),
+}
+
+# A stage's import time as a share of importing everything
+DEFAULT_BUDGETS = {"fetch": 0.5, "process": 0.8}
+
+
+def measure(modules: List[str]) -> Tuple[float, Set[str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True,
+        text=True,
+        cwd=REPO_DIR,
+        check=True,
+    )
+    # Lines are "import time: self [us] | cumulative | name"; names indented
+    # under a parent were imported by it, so only top-level lines are summed
+    total, imported = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        imported.add(name.strip())
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total / 1e6, imported
+
+
+def run(repeat: int, budgets: Dict[str, float]) -> dict:
+    results = {"stages": {}, "violations": []}
+    for stage, modules in STAGE_MODULES.items():
+        # Best of several runs: the first one also pays for a cold disk cache
+        seconds, imported = min(measure(modules) for _ in range(repeat))
+        results["stages"][stage] = {"seconds": round(seconds, 3)}
+        for module in FORBIDDEN.get(stage, ()):
+            if module in imported:
+                results["violations"].append(f"{stage} imports {module}")
+
+    everything = results["stages"]["all"]["seconds"]
+    for stage, budget in budgets.items():
+        share = results["stages"][stage]["seconds"] / everything
+        results["stages"][stage]["share_of_all"] = round(share, 2)
+        if share > budget:
+            results["violations"].append(
+                f"{stage} takes {share:.0%} of the full import time "
+                f"(budget {budget:.0%})"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fetch-budget", type=float, default=DEFAULT_BUDGETS["fetch"])
+    parser.add_argument(
+        "--process-budget", type=float, default=DEFAULT_BUDGETS["process"]
+    )
+    args = parser.parse_args()
+
+    result = run(
+        args.repeat, {"fetch": args.fetch_budget, "process": args.process_budget}
+    )
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result["violations"] else 0)
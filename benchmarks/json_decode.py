@@ -0,0 +1,82 @@
+import argparse
+import json
+import multiprocessing
+import statistics
+import tracemalloc
+from time import perf_counter
+
+import pyarrow as pa
+from loguru import logger
+
+from src.fetch.aqi_fetcher import decode_records
+from src.fetch.utils import decode_response
+
+from .synthetic import generate_rows
+
+DECODERS = {"records": decode_records, "columnar": decode_response}
+KEY = ("1402/10/01", "11:00", 1)
+
+
+def _payload(n_regions: int, snapshots: int) -> bytes:
+    # Hourly, all-station responses: one row per region and snapshot
+    rows = [
+        row
+        for seed in range(snapshots)
+        for row in generate_rows(KEY[0], n_regions, seed=seed)
+    ]
+    return json.dumps({"Data": rows}).encode()
+
+
+def _measure(mode: str, raw: bytes, repeat: int) -> dict:
+    logger.remove()
+    decode = DECODERS[mode]
+    decode(raw, KEY)
+
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        table = decode(raw, KEY)
+        timings.append(perf_counter() - started)
+
+    tracemalloc.start()
+    decode(raw, KEY)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": table.num_rows,
+        "seconds_min": round(min(timings), 4),
+        "seconds_median": round(statistics.median(timings), 4),
+        "rows_per_second": round(table.num_rows / min(timings)),
+        "python_peak_mb": round(python_peak / 2**20, 1),
+        # High-water mark of Arrow's pool over every decode in this process
+        "arrow_peak_mb": round(pa.default_memory_pool().max_memory() / 2**20, 1),
+    }
+
+
+def run(n_regions: int, snapshots: int, repeat: int) -> dict:
+    raw = _payload(n_regions, snapshots)
+    if not decode_records(raw, KEY).equals(decode_response(raw, KEY)):
+        raise SystemExit("Decoders disagree on the benchmark payload")
+
+    context = multiprocessing.get_context("spawn")
+    results = {"payload_mb": round(len(raw) / 2**20, 1)}
+    for mode in DECODERS:
+        # A fresh process per mode so allocator peaks are not shared
+        with context.Pool(1) as pool:
+            results[mode] = pool.apply(_measure, (mode, raw, repeat))
+    results["speedup"] = round(
+        results["records"]["seconds_min"] / results["columnar"]["seconds_min"], 1
+    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--regions", type=int, default=1000)
+    parser.add_argument("--snapshots", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+    result = run(args.regions, args.snapshots, args.repeat)
+    print(json.dumps(result, indent=2))
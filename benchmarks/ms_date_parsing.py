@@ -0,0 +1,60 @@
+import argparse
+import io
+import json
+from time import perf_counter
+
+import pandas as pd
+
+from src.fetch.utils import convert_ms_date, convert_ms_dates
+
+
+def make_series(rows: int, rows_per_snapshot: int = 200) -> pd.Series:
+    # One timestamp per snapshot, repeated for every region in the response
+    start = 1_600_000_000_000
+    return pd.Series(
+        [f"/Date({start + (i // rows_per_snapshot) * 3_600_000})/" for i in range(rows)]
+    )
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        best = min(best, perf_counter() - started)
+    return best
+
+
+def parquet_size(series: pd.Series) -> int:
+    buffer = io.BytesIO()
+    pd.DataFrame({"date": series}).to_parquet(buffer, compression="snappy")
+    return buffer.tell()
+
+
+def run(rows: int, repeat: int) -> dict:
+    series = make_series(rows)
+    legacy = series.apply(convert_ms_date)
+    vectorized = convert_ms_dates(series)
+    assert convert_ms_dates(series, as_string=True).tolist() == legacy.tolist()
+
+    apply_seconds = best_of(lambda: series.apply(convert_ms_date), repeat)
+    string_seconds = best_of(lambda: convert_ms_dates(series, as_string=True), repeat)
+    native_seconds = best_of(lambda: convert_ms_dates(series), repeat)
+    return {
+        "rows": rows,
+        "apply_seconds": round(apply_seconds, 4),
+        "vectorized_string_seconds": round(string_seconds, 4),
+        "vectorized_timestamp_seconds": round(native_seconds, 4),
+        "speedup_timestamp": round(apply_seconds / native_seconds, 1),
+        "parquet_bytes_string": parquet_size(legacy),
+        "parquet_bytes_timestamp": parquet_size(vectorized),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.rows, args.repeat), indent=2))
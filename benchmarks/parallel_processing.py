@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import List
+
+import pandas as pd
+from loguru import logger
+
+from src.process.compaction import compact_aqi_data
+from src.process.data_processor import process_aqi_data
+from src.process.parallel import EXECUTORS, process_aqi_data_parallel
+from src.process.processed_layer import update_processed_layer
+
+from .compaction_load import write_archive
+
+
+def _default_workers() -> List[int]:
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+def _best(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = perf_counter()
+        result = fn()
+        best = min(best, perf_counter() - started)
+    return best, result
+
+
+def run(start: str, end: str, n_regions: int, workers: List[int], repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp) / "data"
+        write_archive(base_dir, start, end, n_regions)
+        compact_aqi_data(base_dir, "month")
+
+        serial_seconds, expected = _best(lambda: process_aqi_data(base_dir), repeat)
+        results = {
+            "cpu_count": os.cpu_count(),
+            "rows": len(expected),
+            "partitions": len(list(base_dir.rglob("*.parquet"))),
+            "serial_seconds": round(serial_seconds, 3),
+            "process_aqi_data": {},
+            "processed_layer": {},
+        }
+
+        for kind in EXECUTORS:
+            for count in workers:
+                seconds, df = _best(
+                    lambda: process_aqi_data_parallel(
+                        base_dir, workers=count, executor=kind
+                    ),
+                    repeat,
+                )
+                # Raises if the parallel frame differs from the serial one in
+                # values, dtypes, category order or row order
+                pd.testing.assert_frame_equal(df, expected)
+                results["process_aqi_data"][f"{kind}_{count}"] = {
+                    "seconds": round(seconds, 3),
+                    "speedup": round(serial_seconds / seconds, 2),
+                }
+
+        for count in workers:
+            # A fresh layer each time, so every file is derived
+            processed_dir = Path(tmp) / f"processed_{count}"
+            started = perf_counter()
+            update_processed_layer(base_dir, processed_dir, workers=count)
+            results["processed_layer"][f"workers_{count}"] = round(
+                perf_counter() - started, 3
+            )
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="1401/01/01")
+    parser.add_argument("--end", default="1402/12/29")
+    parser.add_argument("--regions", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=_default_workers())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    result = run(args.start, args.end, args.regions, args.workers, args.repeat)
+    print(json.dumps(result, indent=2))
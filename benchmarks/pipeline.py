@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import jdatetime
+import matplotlib
+import matplotlib.pyplot as plt
+from loguru import logger
+
+from src.config import AppConfig
+from src.fetch.aqi_fetcher import decode_and_save, fetch_aqi_data
+from src.fetch.utils import build_output_path
+from src.process.data_processor import _load_and_combine_data, derive_features
+from src.visualize.yearly_report import REPORT_COLUMNS, AQIYearlyTrendVisualizer
+
+from .common import load_benchmark_config
+from .stub_server import StubDOEServer
+from .synthetic import generate_responses
+
+# Bump when scenarios or their parameters change meaning, so stored results
+# from different suite versions are not compared against each other
+SUITE_VERSION = 1
+
+
+def _timed(fn: Callable, repeat: int) -> Tuple[List[float], object]:
+    timings, result = [], None
+    for _ in range(repeat):
+        started = perf_counter()
+        result = fn()
+        timings.append(perf_counter() - started)
+    return timings, result
+
+
+def _summary(timings: List[float]) -> Dict[str, float]:
+    return {
+        "min": round(min(timings), 4),
+        "median": round(statistics.median(timings), 4),
+        "max": round(max(timings), 4),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scenario_fetch(
+    work_dir: Path,
+    n_regions: int,
+    days: int,
+    latency: float,
+    error_rate: float,
+    max_concurrent: int,
+) -> dict:
+    with StubDOEServer(
+        n_regions=n_regions,
+        base_latency=latency,
+        capacity=max_concurrent,
+        overload_capacity=max_concurrent * 4,
+        error_rate=error_rate,
+    ) as server:
+        config = load_benchmark_config(
+            work_dir,
+            BASE_URL=server.url,
+            START_DATE="1402/01/01",
+            END_DATE=(
+                jdatetime.date(1402, 1, 1) + jdatetime.timedelta(days=days - 1)
+            ).strftime("%Y/%m/%d"),
+            MAX_CONCURRENT=max_concurrent,
+            REQUEST_RATE=0,
+        )
+        started = perf_counter()
+        asyncio.run(fetch_aqi_data(config))
+        seconds = perf_counter() - started
+
+    files = list(config.INPUT_DIR.rglob("aqi_*.parquet"))
+    return {
+        "days": days,
+        "latency_seconds": latency,
+        "error_rate": error_rate,
+        "seconds": round(seconds, 3),
+        "files": len(files),
+        "requests": server.requests,
+        "server_errors": server.errors,
+        "requests_per_second": round(server.requests / seconds, 1),
+        "days_per_second": round(len(files) / seconds, 1),
+    }
+
+
+def write_synthetic_archive(base_dir: Path, n_regions: int, years: int) -> int:
+    files = 0
+    for date, raw in generate_responses(n_regions, years):
+        decode_and_save(raw, (date, "11:00", 1), build_output_path(base_dir, date))
+        files += 1
+    return files
+
+
+def scenario_load(config: AppConfig, repeat: int) -> Tuple[dict, object]:
+    timings, df = _timed(lambda: _load_and_combine_data(config.INPUT_DIR), repeat)
+    return {"rows": len(df), "seconds": _summary(timings)}, df
+
+
+def scenario_derive(df, repeat: int) -> dict:
+    timings, _ = _timed(lambda: derive_features(df.copy()), repeat)
+    return {
+        "rows": len(df),
+        "seconds": _summary(timings),
+        "rows_per_second": round(len(df) / min(timings)),
+    }
+
+
+def scenario_render(config: AppConfig, df, regions: List[str], dpi: int) -> dict:
+    visualizer = AQIYearlyTrendVisualizer(config, dpi)
+    report_df = df[REPORT_COLUMNS]
+    timings = {}
+    for region in regions:
+        region_df = report_df[report_df["region_name_en"] == region]
+        started = perf_counter()
+        # Rendered to memory and without the render cache: this measures
+        # the chart itself, not the disk or a cache hit
+        pivot_df = visualizer.prepare_trend_data(region_df, "jalali_date", "aqi")
+        fig = visualizer.create_trend_plot(region_df, pivot_df, "jalali_date")
+        fig.savefig(BytesIO(), format="png", dpi=dpi)
+        plt.close(fig)
+        timings[region] = perf_counter() - started
+    return {
+        "dpi": dpi,
+        "charts": len(timings),
+        "seconds_per_chart": _summary(list(timings.values())),
+    }
+
+
+def run(
+    n_regions: int,
+    years: int,
+    fetch_days: int,
+    latency: float,
+    error_rate: float,
+    max_concurrent: int,
+    render_regions: int,
+    dpi: int,
+    repeat: int,
+) -> dict:
+    matplotlib.use("Agg")
+    results = {
+        "suite_version": SUITE_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {
+            "regions": n_regions,
+            "years": years,
+            "fetch_days": fetch_days,
+            "latency": latency,
+            "error_rate": error_rate,
+            "max_concurrent": max_concurrent,
+            "render_regions": render_regions,
+            "dpi": dpi,
+            "repeat": repeat,
+        },
+        "scenarios": {},
+    }
+    scenarios = results["scenarios"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scenarios["fetch"] = scenario_fetch(
+            Path(tmp) / "fetch",
+            n_regions,
+            fetch_days,
+            latency,
+            error_rate,
+            max_concurrent,
+        )
+
+        config = load_benchmark_config(Path(tmp) / "archive")
+        started = perf_counter()
+        files = write_synthetic_archive(config.INPUT_DIR, n_regions, years)
+        scenarios["synthetic_archive"] = {
+            "files": files,
+            "seconds": round(perf_counter() - started, 3),
+        }
+
+        scenarios["load"], df = scenario_load(config, repeat)
+        scenarios["derive"] = scenario_derive(df, repeat)
+        regions = list(df["region_name_en"].cat.categories[:render_regions])
+        scenarios["render"] = scenario_render(config, df, regions, dpi)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--regions", type=int, default=30)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--fetch-days", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--max-concurrent", type=int, default=10)
+    parser.add_argument("--render-regions", type=int, default=3)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="write JSON here as well")
+    args = parser.parse_args()
+
+    logger.remove()
+    result = run(
+        args.regions,
+        args.years,
+        args.fetch_days,
+        args.latency,
+        args.error_rate,
+        args.max_concurrent,
+        args.render_regions,
+        args.dpi,
+        args.repeat,
+    )
+    text = json.dumps(result, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
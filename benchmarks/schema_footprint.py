@@ -0,0 +1,71 @@
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+from src.fetch.utils import build_output_path, generate_jalali_dates, process_dataframe
+from src.process.data_processor import _load_and_combine_data
+
+from .compaction_load import write_archive
+from .synthetic import generate_rows
+
+
+def write_untyped_archive(base_dir: Path, start: str, end: str, n_regions: int) -> None:
+    # The pre-schema write path: inferred dtypes, ISO date strings
+    for date in generate_jalali_dates(start, end):
+        df = pd.DataFrame(generate_rows(date, n_regions))
+        df["requested_date"], df["requested_time"], df["requested_type"] = (
+            date,
+            "11:00",
+            1,
+        )
+        df = process_dataframe(df, dates_as_string=True).drop(columns="gregorian_date")
+        output_file = build_output_path(base_dir, date)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(output_file, index=False, compression="snappy")
+
+
+def measure(base_dir: Path) -> dict:
+    disk = sum(p.stat().st_size for p in base_dir.rglob("*.parquet"))
+    untyped = pd.concat(
+        [pd.read_parquet(p) for p in sorted(base_dir.rglob("*.parquet"))],
+        ignore_index=True,
+    )
+    typed = _load_and_combine_data(base_dir)
+    return {
+        "disk_bytes": disk,
+        "memory_bytes_as_stored": int(untyped.memory_usage(deep=True).sum()),
+        "memory_bytes_typed_load": int(typed.memory_usage(deep=True).sum()),
+        "rows": len(typed),
+    }
+
+
+def run(start: str, end: str, n_regions: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        untyped_dir, typed_dir = Path(tmp) / "untyped", Path(tmp) / "typed"
+        write_untyped_archive(untyped_dir, start, end, n_regions)
+        write_archive(typed_dir, start, end, n_regions)
+        before, after = measure(untyped_dir), measure(typed_dir)
+        return {
+            "untyped": before,
+            "typed": after,
+            "disk_reduction": round(1 - after["disk_bytes"] / before["disk_bytes"], 3),
+            "memory_reduction": round(
+                1 - after["memory_bytes_typed_load"] / before["memory_bytes_as_stored"],
+                3,
+            ),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="1401/01/01")
+    parser.add_argument("--end", default="1402/12/29")
+    parser.add_argument("--regions", type=int, default=200)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(json.dumps(run(args.start, args.end, args.regions), indent=2))
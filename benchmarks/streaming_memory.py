@@ -0,0 +1,75 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import tempfile
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+import pyarrow as pa
+from loguru import logger
+
+from src.process.compaction import compact_aqi_data
+from src.process.data_processor import process_aqi_data
+from src.process.streaming import GroupedAggregator, process_aqi_data_streaming
+
+from .compaction_load import write_archive
+
+
+def _measure(mode: str, base_dir: Path, batch_size: int) -> dict:
+    logger.remove()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    started = perf_counter()
+    if mode == "memory":
+        df = process_aqi_data(base_dir)
+        rows = len(df)
+        df.groupby("region_name_en", observed=True)["aqi"].agg(["count", "sum", "max"])
+    else:
+        rows = process_aqi_data_streaming(
+            base_dir,
+            base_dir.parent / "streamed.parquet",
+            batch_size=batch_size,
+            aggregators=[GroupedAggregator(["region_name_en"])],
+        )
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": rows,
+        "seconds": round(perf_counter() - started, 3),
+        # ru_maxrss is reported in KiB on Linux; imports are excluded
+        "peak_rss_growth_mb": round(
+            (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024
+        ),
+        "python_peak_mb": round(python_peak / 2**20),
+        "arrow_peak_mb": round(pa.default_memory_pool().max_memory() / 2**20),
+    }
+
+
+def run(start: str, end: str, n_regions: int, batch_size: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp) / "data"
+        write_archive(base_dir, start, end, n_regions)
+        compact_aqi_data(base_dir, "year")
+
+        results = {"batch_size": batch_size}
+        for mode in ("memory", "streaming"):
+            # A fresh process per mode so peak RSS is not shared
+            with context.Pool(1) as pool:
+                results[mode] = pool.apply(_measure, (mode, base_dir, batch_size))
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="1402/01/01")
+    parser.add_argument("--end", default="1402/06/31")
+    parser.add_argument("--regions", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    logger.remove()
+    result = run(args.start, args.end, args.regions, args.batch_size)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,109 @@
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from .synthetic import generate_rows
+
+
+class StubDOEServer:
+    def __init__(
+        self,
+        n_regions: int = 40,
+        base_latency: float = 0.02,
+        capacity: int = 8,
+        slowdown_per_request: float = 0.02,
+        overload_capacity: int = 16,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.n_regions = n_regions
+        self.base_latency = base_latency
+        self.capacity = capacity
+        self.slowdown_per_request = slowdown_per_request
+        self.overload_capacity = overload_capacity
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.requests_by_date: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/Home/GetAQIDataByRegion/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Persistent connections, like the real server, so client-side
+            # keepalive has something to reuse
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body are separate writes; without this, Nagle
+                # and delayed ACKs stall every response on a reused connection
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode())
+                status, body = stub.handle(form)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def handle(self, form: dict) -> tuple[int, bytes]:
+        date = form.get("Date", ["1402/01/01 11:00"])[0].split(" ")[0]
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.requests_by_date[date] += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            in_flight = self.in_flight
+            failed = self.random.random() < self.error_rate
+        try:
+            overload = max(0, in_flight - self.capacity)
+            time.sleep(self.base_latency + overload * self.slowdown_per_request)
+            if failed or in_flight > self.overload_capacity:
+                with self._lock:
+                    self.errors += 1
+                return 503, b"{}"
+            body = json.dumps({"Data": generate_rows(date, self.n_regions)})
+            return 200, body.encode()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def __enter__(self) -> "StubDOEServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,108 @@
+import argparse
+import json
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from loguru import logger
+
+from src.fetch.utils import generate_jalali_dates
+from src.process.data_processor import process_aqi_data
+from src.process.summary_cube import SummaryCube, update_summary_cube
+
+from .compaction_load import write_archive
+
+SCAN_COLUMNS = ["region_name_en", "state_name_en", "jalali_date", "aqi"]
+
+
+def _best(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = perf_counter()
+        result = fn()
+        best = min(best, perf_counter() - started)
+    return best, result
+
+
+def full_scan_queries(base_dir: Path):
+    df = process_aqi_data(base_dir, columns=SCAN_COLUMNS)
+    dates = df["jalali_date"].astype(str)
+    last_month = dates.max()[:7]
+    worst = (
+        df[dates.str.startswith(last_month)]
+        .groupby("region_name_en", observed=True)["aqi"]
+        .mean()
+        .nlargest(10)
+    )
+    # Region-days, however many snapshots of a day were PM2.5-dominant
+    pm25_days = (
+        df[df["main_pollutant"] == "PM2.5"]
+        .assign(year=dates.str[:4])
+        .drop_duplicates(["region_name_en", "jalali_date"])
+        .groupby(["state_name_en", "year"], observed=True)
+        .size()
+    )
+    return worst, pm25_days
+
+
+def cube_queries(cube: SummaryCube):
+    worst = cube.top_regions(10)["mean_aqi"]
+    pm25_days = cube.rollup(
+        ["state_name_en", "year"], measures=["days"], main_pollutant="PM2.5"
+    )["days"]
+    return worst, pm25_days
+
+
+def run(start: str, end: str, n_regions: int, repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp) / "data"
+        processed_dir, cube_dir = base_dir / "_processed", base_dir / "_cube"
+        write_archive(base_dir, start, end, n_regions)
+
+        started = perf_counter()
+        update_summary_cube(base_dir, processed_dir, cube_dir)
+        build_seconds = perf_counter() - started
+
+        # One new daily file lands
+        next_day = generate_jalali_dates(end, end)[0]
+        write_archive(base_dir, next_day, next_day, n_regions)
+        started = perf_counter()
+        report = update_summary_cube(base_dir, processed_dir, cube_dir)
+        incremental_seconds = perf_counter() - started
+
+        scan_seconds, (scan_worst, scan_days) = _best(
+            lambda: full_scan_queries(processed_dir), repeat
+        )
+        load_seconds, cube = _best(lambda: SummaryCube.load(cube_dir), repeat)
+        cube_seconds, (cube_worst, cube_days) = _best(
+            lambda: cube_queries(cube), repeat
+        )
+
+        return {
+            "regions": n_regions,
+            "cube_cells": report.cells,
+            "cube_kb": round((cube_dir / "summary_cube.parquet").stat().st_size / 1024),
+            "build_seconds": round(build_seconds, 3),
+            "incremental_seconds": round(incremental_seconds, 3),
+            "full_scan_query_seconds": round(scan_seconds, 4),
+            "cube_load_seconds": round(load_seconds, 4),
+            "cube_query_seconds": round(cube_seconds, 4),
+            "speedup": round(scan_seconds / (load_seconds + cube_seconds), 1),
+            "results_match": bool(
+                list(scan_worst.index) == list(cube_worst.index)
+                and scan_days.sort_index().tolist()
+                == cube_days.sort_index().astype(int).tolist()
+            ),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="1401/01/01")
+    parser.add_argument("--end", default="1402/12/28")
+    parser.add_argument("--regions", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(json.dumps(run(args.start, args.end, args.regions, args.repeat), indent=2))
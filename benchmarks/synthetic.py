@@ -0,0 +1,74 @@
+import json
+import math
+import random
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+import jdatetime
+
+from src.fetch.utils import generate_jalali_dates
+
+POLLUTANTS = ["PM 2.5", "PM10", "O3", "NO2", "SO2", "CO"]
+POLLUTANT_WEIGHTS = [45, 25, 15, 8, 5, 2]
+
+# Winter inversions peak around early Dey (day ~280 of the Jalali year)
+SEASONAL_PEAK_DAY = 280
+SEASONAL_AMPLITUDE = 35
+
+
+def _ms_date(jalali_date: str, hour: int = 11) -> str:
+    day = jdatetime.datetime.strptime(jalali_date, "%Y/%m/%d").togregorian()
+    moment = datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc)
+    return f"/Date({int(moment.timestamp() * 1000)})/"
+
+
+def generate_rows(
+    jalali_date: str, n_regions: int, seed: int | None = None
+) -> List[Dict[str, Any]]:
+    # crc32 rather than hash(): str hashes change between processes
+    rng = random.Random(seed if seed is not None else zlib.crc32(jalali_date.encode()))
+    stamp = _ms_date(jalali_date)
+    _, month, day = map(int, jalali_date.split("/"))
+    day_of_year = (month - 1) * 31 - max(0, month - 7) + day - 1
+    seasonal = SEASONAL_AMPLITUDE * math.cos(
+        2 * math.pi * (day_of_year - SEASONAL_PEAK_DAY) / 366
+    )
+    rows = []
+    for region_id in range(1, n_regions + 1):
+        # Each region keeps a stable baseline so rankings are meaningful
+        baseline = 60 + (region_id * 37) % 60
+        aqi = max(0, int(rng.gauss(baseline + seasonal, 30)))
+        rows.append(
+            {
+                "Id": rng.randint(1, 10**9),
+                "StateId": region_id % 31 + 1,
+                "RegionId": region_id,
+                "CO": round(rng.uniform(0, 15), 2),
+                "O3": round(rng.uniform(0, 120), 2),
+                "NO2": round(rng.uniform(0, 150), 2),
+                "SO2": round(rng.uniform(0, 120), 2),
+                "PM10": round(rng.uniform(0, 250), 2),
+                "PM2_5": round(rng.uniform(0, 180), 2),
+                "AQI": aqi,
+                "Pollutant": rng.choices(POLLUTANTS, POLLUTANT_WEIGHTS)[0],
+                "StateName_Fa": f"استان {region_id % 31 + 1}",
+                "StateName_En": f"State{region_id % 31 + 1}",
+                "Region_Fa": f"منطقه {region_id}",
+                "Region_En": "Tehran" if region_id == 1 else f"Region{region_id}",
+                "RegionLatitude": 25 + region_id % 15,
+                "RegionLongitude": 44 + region_id % 18,
+                "CreateDate": stamp,
+                "ModifyDate": stamp,
+                "Date": stamp,
+            }
+        )
+    return rows
+
+
+def generate_responses(
+    n_regions: int, years: int, last_year: int = 1402
+) -> Iterator[Tuple[str, bytes]]:
+    for year in range(last_year - years + 1, last_year + 1):
+        for date in generate_jalali_dates(f"{year}/01/01", f"{year}/12/29"):
+            yield date, json.dumps({"Data": generate_rows(date, n_regions)}).encode()
@@ -1,12 +1,17 @@
+import argparse
 import asyncio
 from pathlib import Path
+from typing import Optional
 
 from loguru import logger
 
 from src.config import AppConfig
-from src.fetch.aqi_fetcher import fetch_aqi_data
-from src.process.data_processor import process_aqi_data
-from src.visualize.yearly_report import create_aqi_yearly_trend_report
+from src.constants import AQIColumns
+from src.metrics import METRICS, span
+
+# Heavy dependencies (pandas, pyarrow.dataset, matplotlib) are imported in
+# the stage that needs them, so a fetch-only run never loads them
+STAGES = ("fetch", "process", "render", "all")
 
 
 def setup_logging() -> None:
@@ -19,7 +24,143 @@ def setup_logging() -> None:
     )
 
 
+async def run_fetch(config: AppConfig) -> bool:
+    logger.info("Starting data fetch...")
+    with span("stage_fetch"):
+        if config.BACKFILL_ENABLED:
+            from src.fetch.backfill import run_backfill
+
+            report = await run_backfill(config)
+            return not report.interrupted
+
+        from src.fetch.aqi_fetcher import fetch_aqi_data
+
+        await fetch_aqi_data(config)
+        return True
+
+
+def load_report_data(config: AppConfig, processed=None):
+    from src.process.processed_layer import load_processed_aqi_data
+
+    return load_processed_aqi_data(
+        config.INPUT_DIR,
+        config.PROCESSED_DIR,
+        columns=AQIColumns.REPORT,
+        regions=config.PLOT_REGIONS,
+        batch_size=config.PROCESS_BATCH_SIZE,
+        workers=config.PROCESS_WORKERS,
+        processed=processed,
+    )
+
+
+def run_process(config: AppConfig):
+    if config.COMPACTION_GRANULARITY != "off":
+        from src.process.compaction import compact_aqi_data
+
+        logger.info("Compacting daily files...")
+        with span("stage_compaction"):
+            compact_aqi_data(config.INPUT_DIR, config.COMPACTION_GRANULARITY)
+
+    from src.process.processed_layer import update_processed_layer
+
+    logger.info("Reading and processing data...")
+    with span("stage_process"):
+        # Brought up to date once; every stage below reads the same layer
+        processed = update_processed_layer(
+            config.INPUT_DIR,
+            config.PROCESSED_DIR,
+            config.PROCESS_BATCH_SIZE,
+            config.PROCESS_WORKERS,
+        )
+        df = load_report_data(config, processed)
+
+    if config.ANALYTICS_ENABLED:
+        from src.process.analytics import update_aqi_analytics
+
+        with span("stage_analytics"):
+            update_aqi_analytics(
+                config.INPUT_DIR, config.PROCESSED_DIR, config.ANALYTICS_DIR, processed
+            )
+
+    if config.CUBE_ENABLED:
+        from src.process.summary_cube import update_summary_cube
+
+        with span("stage_cube"):
+            update_summary_cube(
+                config.INPUT_DIR, config.PROCESSED_DIR, config.CUBE_DIR, processed
+            )
+
+    if config.EPISODES_ENABLED:
+        from src.process.episodes import update_episodes
+
+        with span("stage_episodes"):
+            update_episodes(
+                config.INPUT_DIR, config.PROCESSED_DIR, config.EPISODES_DIR, processed
+            )
+    return df
+
+
+def run_render(config: AppConfig, df=None) -> None:
+    if df is None:
+        with span("stage_process"):
+            df = load_report_data(config)
+    if df.empty:
+        logger.error("No data to render")
+        return
+
+    logger.info("Creating visualizations...")
+    with span("stage_render"):
+        if config.RENDER_WORKERS > 1:
+            from src.visualize.parallel import render_regions_parallel
+
+            render_regions_parallel(
+                df, config.PLOT_REGIONS, config, workers=config.RENDER_WORKERS
+            )
+        else:
+            from src.visualize.yearly_report import create_aqi_yearly_trend_report
+
+            for region in config.PLOT_REGIONS:
+                create_aqi_yearly_trend_report(df, region=region, config=config)
+
+        if config.OVERVIEW_FORMAT != "off":
+            from src.visualize.overview import create_aqi_national_overview
+
+            create_aqi_national_overview(
+                df, config.PLOT_REGIONS, config, output_format=config.OVERVIEW_FORMAT
+            )
+
+
+async def run_pipeline(config: AppConfig, stage: str = "all") -> None:
+    if stage in ("fetch", "all") and not await run_fetch(config):
+        return
+
+    df = None
+    if stage in ("process", "all"):
+        df = run_process(config)
+        if df.empty:
+            logger.error("No data to process")
+            return
+
+    if stage in ("render", "all"):
+        run_render(config, df)
+
+    logger.info(f"Pipeline completed ({stage})")
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Iran AQI pipeline")
+    parser.add_argument(
+        "stage",
+        nargs="?",
+        default="all",
+        choices=STAGES,
+        help="run a single stage, or all of them in order (default)",
+    )
+    return parser.parse_args(argv)
+
+
 async def main() -> None:
+    args = parse_args()
     setup_logging()
     config = AppConfig.load()
     logger.warning(
@@ -28,23 +169,12 @@ async def main() -> None:
         str(config.FONT_REGULAR_PATH),
         str(config.FONT_BOLD_PATH),
     )
-    # Step 1: Fetch Data (async)
-    logger.info("Starting data fetch...")
-    await fetch_aqi_data(config)
-
-    # Step 2: Process Data
-    logger.info("Reading and processing data...")
-    df = process_aqi_data(config.INPUT_DIR)
-    if df.empty:
-        logger.error("No data to process")
-        return
-
-    # Step 3: Create Visualizations
-    logger.info("Creating visualizations...")
-    for region in config.PLOT_REGIONS:
-        create_aqi_yearly_trend_report(df, region=region, config=config)
-
-    logger.info("Pipeline completed")
+    METRICS.configure_profiling(config.PROFILE_STAGE, config.PROFILE_MODE)
+    try:
+        await run_pipeline(config, args.stage)
+    finally:
+        report_path, _ = METRICS.export(config.METRICS_DIR)
+        logger.info(f"Run metrics written to: {report_path}")
 
 
 if __name__ == "__main__":
@@ -1,20 +1,68 @@
 import os
 from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
 from typing import Final, List
 
 from dotenv import load_dotenv
 
 
+def normalize_time(value: str) -> str:
+    # "9:00" and "09:00" are the same snapshot; keys, paths and the stored
+    # snapshot_time all use the zero-padded form
+    try:
+        return datetime.strptime(value.strip(), "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ValueError(f"Invalid snapshot time {value!r}, expected HH:MM") from None
+
+
 @dataclass(frozen=True)
 class AppConfig:
     INPUT_DIR: Final[Path]
     OUTPUT_DIR: Final[Path]
+    PROCESSED_DIR: Final[Path]
     PLOTS_DIR: Final[Path]
+    ANALYTICS_DIR: Final[Path]
+    ANALYTICS_ENABLED: Final[bool]
+    CUBE_DIR: Final[Path]
+    CUBE_ENABLED: Final[bool]
+    EPISODES_DIR: Final[Path]
+    EPISODES_ENABLED: Final[bool]
     START_DATE: Final[str]
     END_DATE: Final[str]
+    FETCH_TIMES: Final[List[str]]
+    FETCH_REGION_TYPES: Final[List[int]]
     MAX_CONCURRENT: Final[int]
+    MIN_CONCURRENT: Final[int]
+    INITIAL_CONCURRENT: Final[int]
+    REQUEST_RATE: Final[float]
+    REQUEST_BURST: Final[float]
+    MAX_FETCH_ATTEMPTS: Final[int]
+    EMPTY_RECHECK_DAYS: Final[float]
+    EMPTY_RECHECK_HOURS: Final[float]
+    REQUEST_ATTEMPTS: Final[int]
+    CONNECT_TIMEOUT: Final[float]
+    READ_TIMEOUT: Final[float]
+    KEEPALIVE_EXPIRY: Final[float]
+    HTTP2: Final[bool]
+    SAVE_WORKERS: Final[int]
+    SAVE_EXECUTOR: Final[str]
+    SAVE_QUEUE_SIZE: Final[int]
+    MANIFEST_PATH: Final[Path]
+    BACKFILL_ENABLED: Final[bool]
+    BACKFILL_CHUNK_DAYS: Final[int]
+    BACKFILL_RETRY_ATTEMPTS: Final[int]
+    BACKFILL_CHECKPOINT_PATH: Final[Path]
+    COMPACTION_GRANULARITY: Final[str]
+    PROCESS_BATCH_SIZE: Final[int]
+    PROCESS_WORKERS: Final[int]
     PLOT_REGIONS: Final[List[str]]
+    METRICS_DIR: Final[Path]
+    PROFILE_STAGE: Final[str]
+    PROFILE_MODE: Final[str]
+    RENDER_WORKERS: Final[int]
+    OVERVIEW_FORMAT: Final[str]
+    TREND_AGGREGATION: Final[str]
     FONT_REGULAR_PATH: Final[Path]
     FONT_BOLD_PATH: Final[Path]
     HEADERS: Final[dict]
@@ -25,15 +73,63 @@ class AppConfig:
     def load(cls) -> "AppConfig":
         load_dotenv()
         base_dir = Path(__file__).parent.parent
+        input_dir = base_dir / os.getenv("INPUT_DIR")
+        output_dir = base_dir / os.getenv("OUTPUT_DIR")
 
         return cls(
-            INPUT_DIR=base_dir / os.getenv("INPUT_DIR"),
-            OUTPUT_DIR=base_dir / os.getenv("OUTPUT_DIR"),
+            INPUT_DIR=input_dir,
+            OUTPUT_DIR=output_dir,
+            PROCESSED_DIR=base_dir
+            / os.getenv("PROCESSED_DIR", str(input_dir / "_processed")),
             PLOTS_DIR=base_dir / os.getenv("PLOTS_DIR"),
+            ANALYTICS_DIR=base_dir
+            / os.getenv("ANALYTICS_DIR", str(output_dir / "_analytics")),
+            ANALYTICS_ENABLED=os.getenv("ANALYTICS_ENABLED", "false").lower() == "true",
+            CUBE_DIR=base_dir / os.getenv("CUBE_DIR", str(output_dir / "_cube")),
+            CUBE_ENABLED=os.getenv("CUBE_ENABLED", "false").lower() == "true",
+            EPISODES_DIR=base_dir
+            / os.getenv("EPISODES_DIR", str(output_dir / "_episodes")),
+            EPISODES_ENABLED=os.getenv("EPISODES_ENABLED", "false").lower() == "true",
             START_DATE=os.getenv("START_DATE", "1402/01/01"),
             END_DATE=os.getenv("END_DATE", "1402/12/29"),
+            FETCH_TIMES=[
+                normalize_time(t) for t in os.getenv("FETCH_TIMES", "11:00").split(",")
+            ],
+            FETCH_REGION_TYPES=[
+                int(t) for t in os.getenv("FETCH_REGION_TYPES", "1").split(",")
+            ],
             MAX_CONCURRENT=int(os.getenv("MAX_CONCURRENT", "10")),
+            MIN_CONCURRENT=int(os.getenv("MIN_CONCURRENT", "1")),
+            INITIAL_CONCURRENT=int(os.getenv("INITIAL_CONCURRENT", "4")),
+            REQUEST_RATE=float(os.getenv("REQUEST_RATE", "20")),
+            REQUEST_BURST=float(os.getenv("REQUEST_BURST", "10")),
+            MAX_FETCH_ATTEMPTS=int(os.getenv("MAX_FETCH_ATTEMPTS", "3")),
+            EMPTY_RECHECK_DAYS=float(os.getenv("EMPTY_RECHECK_DAYS", "3")),
+            EMPTY_RECHECK_HOURS=float(os.getenv("EMPTY_RECHECK_HOURS", "6")),
+            REQUEST_ATTEMPTS=int(os.getenv("REQUEST_ATTEMPTS", "5")),
+            CONNECT_TIMEOUT=float(os.getenv("CONNECT_TIMEOUT", "5")),
+            READ_TIMEOUT=float(os.getenv("READ_TIMEOUT", "30")),
+            KEEPALIVE_EXPIRY=float(os.getenv("KEEPALIVE_EXPIRY", "30")),
+            HTTP2=os.getenv("HTTP2", "false").lower() == "true",
+            SAVE_WORKERS=int(os.getenv("SAVE_WORKERS", "2")),
+            SAVE_EXECUTOR=os.getenv("SAVE_EXECUTOR", "thread"),
+            SAVE_QUEUE_SIZE=int(os.getenv("SAVE_QUEUE_SIZE", "8")),
+            MANIFEST_PATH=output_dir / "_fetch_manifest.jsonl",
+            BACKFILL_ENABLED=os.getenv("BACKFILL_ENABLED", "false").lower() == "true",
+            BACKFILL_CHUNK_DAYS=int(os.getenv("BACKFILL_CHUNK_DAYS", "30")),
+            BACKFILL_RETRY_ATTEMPTS=int(os.getenv("BACKFILL_RETRY_ATTEMPTS", "2")),
+            BACKFILL_CHECKPOINT_PATH=output_dir / "_backfill_checkpoint.json",
+            COMPACTION_GRANULARITY=os.getenv("COMPACTION_GRANULARITY", "month"),
+            PROCESS_BATCH_SIZE=int(os.getenv("PROCESS_BATCH_SIZE", "65536")),
+            PROCESS_WORKERS=int(os.getenv("PROCESS_WORKERS", "1")),
             PLOT_REGIONS=os.getenv("PLOT_REGIONS", "Tehran").split(","),
+            METRICS_DIR=base_dir
+            / os.getenv("METRICS_DIR", str(output_dir / "_metrics")),
+            PROFILE_STAGE=os.getenv("PROFILE_STAGE", ""),
+            PROFILE_MODE=os.getenv("PROFILE_MODE", "cprofile"),
+            RENDER_WORKERS=int(os.getenv("RENDER_WORKERS", "1")),
+            OVERVIEW_FORMAT=os.getenv("OVERVIEW_FORMAT", "off"),
+            TREND_AGGREGATION=os.getenv("TREND_AGGREGATION", "mean"),
             FONT_REGULAR_PATH=base_dir / os.getenv("FONT_REGULAR_PATH"),
             FONT_BOLD_PATH=base_dir / os.getenv("FONT_BOLD_PATH"),
             HEADERS={
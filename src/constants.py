@@ -35,4 +35,14 @@ class AQIColumns:
         "ModifyDate": "modify_date",
         "Date": "date",
         "requested_date": "jalali_date",
+        "requested_time": "snapshot_time",
+        "requested_type": "region_type",
     }
+    # Columns the trend charts read; the process stage loads just these
+    REPORT: Final[List[str]] = [
+        "region_name_en",
+        "region_name_fa",
+        "jalali_date",
+        "snapshot_time",
+        "aqi",
+    ]
@@ -1,39 +1,231 @@
 import asyncio
-from typing import Any, Dict
+import json
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
 
 import backoff
 import httpx
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from loguru import logger
 
 from ..config import AppConfig
-from .utils import build_output_path, generate_jalali_dates, process_dataframe
+from ..metrics import (
+    METRICS,
+    call_collected,
+    increment,
+    merge_collected,
+    merge_failed,
+    span,
+)
+from ..schema import enforce_schema, to_arrow_table
+from .manifest import FetchManifest, FetchStatus, ManifestEntry, ManifestKey
+from .pipeline import StageStats
+from .rate_control import AdaptiveConcurrencyLimiter, Outcome, TokenBucket
+from .session import AttemptTimer, create_client
+from .utils import (
+    build_output_path,
+    decode_response,
+    generate_fetch_keys,
+    generate_jalali_dates,
+    hash_table,
+    process_dataframe,
+)
+
+
+def decode_records(raw: bytes, key: ManifestKey) -> Optional[pa.Table]:
+    import pandas as pd
+
+    json_data = json.loads(raw)
+    if (
+        not isinstance(json_data, dict)
+        or "Data" not in json_data
+        or not json_data["Data"]
+    ):
+        return None
+
+    df = pd.DataFrame(json_data["Data"])
+    df["requested_date"], df["requested_time"], df["requested_type"] = key
+    return to_arrow_table(enforce_schema(process_dataframe(df)))
+
+
+def decode_and_save(
+    raw: bytes, key: ManifestKey, output_file: Path
+) -> Tuple[int, Optional[str]]:
+    try:
+        table = decode_response(raw, key)
+    except pa.ArrowInvalid:
+        # Payloads the columnar parser rejects (non-object bodies, odd field
+        # types) still go through the row-by-row path
+        increment("decode_fallbacks")
+        table = decode_records(raw, key)
+    if table is None:
+        return 0, None
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside and renamed, so an interrupted save never leaves a
+    # truncated file under a name that looks complete
+    tmp_path = output_file.with_name(f".{output_file.name}.tmp")
+    pq.write_table(table, tmp_path, compression="snappy")
+    tmp_path.replace(output_file)
+    return table.num_rows, hash_table(table)
+
+
+def classify_response(response: httpx.Response) -> Outcome:
+    if response.status_code == 429 or response.status_code >= 500:
+        return Outcome.OVERLOAD
+    if response.is_error:
+        return Outcome.ERROR
+    return Outcome.OK
 
 
 class AQIDataFetcher:
     def __init__(self, config: AppConfig):
         self.config = config
-        self.semaphore = asyncio.Semaphore(config.MAX_CONCURRENT)
-        self.transport = httpx.AsyncHTTPTransport(retries=2)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial=config.INITIAL_CONCURRENT,
+            min_limit=config.MIN_CONCURRENT,
+            max_limit=config.MAX_CONCURRENT,
+        )
+        self.rate_limiter = TokenBucket(
+            rate=config.REQUEST_RATE, capacity=config.REQUEST_BURST
+        )
+        self.manifest = FetchManifest(
+            config.MANIFEST_PATH,
+            max_attempts=config.MAX_FETCH_ATTEMPTS,
+            empty_recheck_days=config.EMPTY_RECHECK_DAYS,
+            empty_recheck_hours=config.EMPTY_RECHECK_HOURS,
+        )
+        self.fetch_stats = StageStats("fetch")
+        self.save_stats = StageStats("save")
+        self.stop_requested = False
 
-    async def fetch_data(
+    async def fetch_raw(
         self, session: httpx.AsyncClient, payload: Dict[str, str]
-    ) -> Dict[str, Any]:
+    ) -> bytes:
         @backoff.on_exception(
             backoff.expo,
             (httpx.RequestError, httpx.HTTPStatusError),
-            max_tries=5,
-            jitter=None,
+            max_tries=self.config.REQUEST_ATTEMPTS,
+            jitter=backoff.full_jitter,
+            on_backoff=lambda _: increment("fetch_retries"),
         )
         async def _fetch():
-            response = await session.post(
-                self.config.BASE_URL, data=payload, timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
+            # Every attempt, retries included, draws from the shared bucket
+            await self.rate_limiter.acquire()
+            await self.limiter.acquire()
+            started = perf_counter()
+            outcome = Outcome.ERROR
+            increment("fetch_requests")
+            timer = AttemptTimer()
+            try:
+                with span("http_request"):
+                    response = await session.post(
+                        self.config.BASE_URL,
+                        data=payload,
+                        extensions={"trace": timer},
+                    )
+                increment("fetch_bytes", len(response.content))
+                outcome = classify_response(response)
+                response.raise_for_status()
+                return response.content
+            except httpx.TimeoutException:
+                outcome = Outcome.OVERLOAD
+                raise
+            finally:
+                timer.record(ok=outcome is Outcome.OK)
+                await self.limiter.release(perf_counter() - started, outcome)
 
         return await _fetch()
 
+    async def fetch_data(
+        self, session: httpx.AsyncClient, payload: Dict[str, str]
+    ) -> Dict[str, Any]:
+        return json.loads(await self.fetch_raw(session, payload))
+
+    def _create_executor(self) -> Executor:
+        if self.config.SAVE_EXECUTOR == "process":
+            # Spawned like the processing pools: forking from inside the
+            # running event loop would copy its state into the workers
+            return ProcessPoolExecutor(
+                max_workers=self.config.SAVE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.config.SAVE_WORKERS, thread_name_prefix="aqi-save"
+        )
+
+    async def _fetch_stage(
+        self, session: httpx.AsyncClient, key: ManifestKey
+    ) -> Optional[bytes]:
+        date, time, region_type = key
+        payload = {"Date": f"{date} {time}", "type": str(region_type)}
+
+        started = perf_counter()
+        try:
+            logger.debug(f"Fetching {date} {time} type={region_type}")
+            with span("fetch_data"):
+                raw = await self.fetch_raw(session, payload)
+        except Exception as e:
+            self.fetch_stats.record(perf_counter() - started, ok=False)
+            logger.error(f"Failed for {date}: {e}")
+            self.manifest.record(
+                ManifestEntry(date, time, region_type, FetchStatus.FAILED, error=str(e))
+            )
+            return None
+
+        self.fetch_stats.record(perf_counter() - started)
+        return raw
+
+    async def _save_stage(
+        self, executor: Optional[Executor], key: ManifestKey, raw: bytes
+    ) -> bool:
+        date, time, region_type = key
+        output_file = build_output_path(self.config.OUTPUT_DIR, date, time, region_type)
+
+        started = perf_counter()
+        try:
+            with span("decode_and_save"):
+                collected = await asyncio.get_running_loop().run_in_executor(
+                    executor, call_collected, decode_and_save, raw, key, output_file
+                )
+            rows, content_hash = merge_collected(collected)
+        except Exception as e:
+            merge_failed(e)
+            self.save_stats.record(perf_counter() - started, ok=False)
+            logger.error(f"Failed to decode or save {date}: {e}")
+            self.manifest.record(
+                ManifestEntry(date, time, region_type, FetchStatus.FAILED, error=str(e))
+            )
+            return False
+        self.save_stats.record(perf_counter() - started)
+
+        if not rows:
+            logger.warning(f"No data for {date}")
+            self.manifest.record(
+                ManifestEntry(date, time, region_type, FetchStatus.EMPTY)
+            )
+            return True
+
+        self.manifest.record(
+            ManifestEntry(
+                date,
+                time,
+                region_type,
+                FetchStatus.SUCCESS,
+                rows=rows,
+                content_hash=content_hash,
+                path=str(output_file),
+            )
+        )
+        increment("rows_saved", rows)
+        logger.success(f"Saved {rows} records to {output_file}")
+        return True
+
     async def fetch_and_save(
         self,
         session: httpx.AsyncClient,
@@ -41,46 +233,106 @@ class AQIDataFetcher:
         time: str = "11:00",
         region_type: int = 1,
     ) -> None:
-        output_file = build_output_path(self.config.OUTPUT_DIR, date)
-        if output_file.exists():
-            logger.info(f"Skipping {date} (already exists)")
-            return
+        key = (date, time, region_type)
+        started = perf_counter()
+        raw = await self._fetch_stage(session, key)
+        ok = raw is not None and await self._save_stage(None, key, raw)
+        METRICS.observe("fetch_and_save", perf_counter() - started, ok)
 
-        payload = {"Date": f"{date} {time}", "type": str(region_type)}
+    def request_stop(self) -> None:
+        # Keys already being fetched finish and are recorded; queued ones are
+        # left for the next run
+        if not self.stop_requested:
+            logger.warning("Stop requested; finishing in-flight requests")
+        self.stop_requested = True
+
+    async def _produce(self, keys, fetch_queue: asyncio.Queue) -> None:
+        for key in keys:
+            if self.stop_requested:
+                break
+            await fetch_queue.put(key)
+            self.fetch_stats.observe_queue(fetch_queue)
+        for _ in range(self.config.MAX_CONCURRENT):
+            await fetch_queue.put(None)
 
+    async def _fetch_worker(
+        self,
+        session: httpx.AsyncClient,
+        fetch_queue: asyncio.Queue,
+        save_queue: asyncio.Queue,
+    ) -> None:
+        while (key := await fetch_queue.get()) is not None:
+            if self.stop_requested:
+                continue
+            # fetch_and_save covers a key end to end, queueing included,
+            # although its two halves run on different workers
+            started = perf_counter()
+            raw = await self._fetch_stage(session, key)
+            if raw is None:
+                METRICS.observe("fetch_and_save", perf_counter() - started, ok=False)
+                continue
+            await save_queue.put((key, raw, started))
+            self.save_stats.observe_queue(save_queue)
+
+    async def _save_worker(self, executor: Executor, save_queue: asyncio.Queue) -> None:
+        while (item := await save_queue.get()) is not None:
+            key, raw, started = item
+            ok = await self._save_stage(executor, key, raw)
+            METRICS.observe("fetch_and_save", perf_counter() - started, ok)
+
+    @asynccontextmanager
+    async def open_session(self) -> AsyncIterator[Tuple[httpx.AsyncClient, Executor]]:
+        executor = self._create_executor()
         try:
-            async with self.semaphore:
-                logger.debug(f"Fetching {date}")
-                json_data = await self.fetch_data(session, payload)
-        except Exception as e:
-            logger.error(f"Failed for {date}: {e}")
-            return
+            async with create_client(self.config) as client:
+                yield client, executor
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.manifest.compact()
+            self.limiter.log()
+            logger.info(f"Manifest status: {self.manifest.summary()}")
 
-        if (
-            not isinstance(json_data, dict)
-            or "Data" not in json_data
-            or not json_data["Data"]
-        ):
-            logger.warning(f"No data for {date}")
-            return
+    async def fetch_keys(
+        self, client: httpx.AsyncClient, executor: Executor, keys: Iterable[ManifestKey]
+    ) -> None:
+        fetch_queue: asyncio.Queue = asyncio.Queue(
+            maxsize=self.config.MAX_CONCURRENT * 2
+        )
+        save_queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.SAVE_QUEUE_SIZE)
+        self.fetch_stats = StageStats("fetch")
+        self.save_stats = StageStats("save")
 
-        df = pd.DataFrame(json_data["Data"])
-        df["requested_date"] = date
-        df = process_dataframe(df)
-        df.to_parquet(output_file, index=False, compression="snappy")
-        logger.success(f"Saved {len(df)} records to {output_file}")
+        try:
+            save_workers = [
+                asyncio.create_task(self._save_worker(executor, save_queue))
+                for _ in range(self.config.SAVE_WORKERS)
+            ]
+            await asyncio.gather(
+                self._produce(keys, fetch_queue),
+                *(
+                    self._fetch_worker(client, fetch_queue, save_queue)
+                    for _ in range(self.config.MAX_CONCURRENT)
+                ),
+            )
+            self.fetch_stats.finish()
+            for _ in save_workers:
+                await save_queue.put(None)
+            await asyncio.gather(*save_workers)
+            self.save_stats.finish()
+        finally:
+            self.fetch_stats.log()
+            self.save_stats.log()
 
     async def fetch_all(self) -> None:
         dates = generate_jalali_dates(self.config.START_DATE, self.config.END_DATE)
-        self.config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-        async with httpx.AsyncClient(
-            headers=self.config.HEADERS,
-            cookies=self.config.COOKIES,
-            transport=self.transport,
-        ) as client:
-            tasks = [self.fetch_and_save(client, date) for date in dates]
-            await asyncio.gather(*tasks)
+        self.manifest.load(data_dir=self.config.OUTPUT_DIR)
+        keys = self.manifest.plan(
+            generate_fetch_keys(
+                dates, self.config.FETCH_TIMES, self.config.FETCH_REGION_TYPES
+            )
+        )
+        async with self.open_session() as (client, executor):
+            await self.fetch_keys(client, executor, keys)
 
 
 async def fetch_aqi_data(config: AppConfig) -> None:
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import signal
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+from loguru import logger
+
+from ..config import AppConfig
+from .aqi_fetcher import AQIDataFetcher
+from .manifest import FetchStatus, ManifestKey
+from .utils import generate_fetch_keys, generate_jalali_dates
+
+CHECKPOINT_VERSION = 1
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+@dataclass
+class BackfillReport:
+    chunks: int = 0
+    fetched_chunks: List[str] = field(default_factory=list)
+    skipped_chunks: int = 0
+    retried: int = 0
+    still_failed: int = 0
+    interrupted: bool = False
+
+
+def split_range(start: str, end: str, chunk_days: int) -> List[Tuple[str, str]]:
+    dates = generate_jalali_dates(start, end)
+    return [
+        (chunk[0], chunk[-1])
+        for chunk in (
+            dates[i : i + chunk_days] for i in range(0, len(dates), chunk_days)
+        )
+    ]
+
+
+class BackfillCheckpoint:
+    def __init__(self, path: Path, config: AppConfig):
+        self.path = path
+        # A checkpoint only applies to the run it was written for
+        self.run = {
+            "start": config.START_DATE,
+            "end": config.END_DATE,
+            "chunk_days": config.BACKFILL_CHUNK_DAYS,
+            "times": config.FETCH_TIMES,
+            "region_types": config.FETCH_REGION_TYPES,
+        }
+        self.chunks: Dict[str, Dict] = {}
+        self.retry_done = False
+
+    def load(self) -> "BackfillCheckpoint":
+        if not self.path.exists():
+            return self
+        try:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable backfill checkpoint: {e}")
+            return self
+        if state.get("version") != CHECKPOINT_VERSION or state.get("run") != self.run:
+            logger.info("Backfill parameters changed; starting a new checkpoint")
+            return self
+        self.chunks = state["chunks"]
+        self.retry_done = state["retry_done"]
+        return self
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "run": self.run,
+            "chunks": self.chunks,
+            "retry_done": self.retry_done,
+        }
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps(state, indent=1), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def is_done(self, chunk_start: str) -> bool:
+        return chunk_start in self.chunks
+
+    def mark_done(self, chunk_start: str, chunk_end: str, failed: int) -> None:
+        self.chunks[chunk_start] = {
+            "end": chunk_end,
+            "failed": failed,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.save()
+
+
+def _chunk_keys(config: AppConfig, start: str, end: str) -> List[ManifestKey]:
+    return list(
+        generate_fetch_keys(
+            generate_jalali_dates(start, end),
+            config.FETCH_TIMES,
+            config.FETCH_REGION_TYPES,
+        )
+    )
+
+
+def _failed_keys(fetcher: AQIDataFetcher, keys: List[ManifestKey]) -> List[ManifestKey]:
+    return [
+        key
+        for key in keys
+        if (entry := fetcher.manifest.get(key)) is not None
+        and entry.status == FetchStatus.FAILED
+    ]
+
+
+def _install_stop_handlers(fetcher: AQIDataFetcher) -> None:
+    loop = asyncio.get_running_loop()
+
+    def stop() -> None:
+        fetcher.request_stop()
+        # A second signal falls through to the default and ends the process
+        for sig in STOP_SIGNALS:
+            loop.remove_signal_handler(sig)
+
+    for sig in STOP_SIGNALS:
+        loop.add_signal_handler(sig, stop)
+
+
+def _remove_stop_handlers() -> None:
+    loop = asyncio.get_running_loop()
+    for sig in STOP_SIGNALS:
+        loop.remove_signal_handler(sig)
+
+
+async def _retry_pass(
+    config: AppConfig,
+    fetcher: AQIDataFetcher,
+    client: httpx.AsyncClient,
+    executor: Executor,
+    keys: List[ManifestKey],
+) -> int:
+    # Its own budget on top of MAX_FETCH_ATTEMPTS, spent only after every
+    # chunk had its turn, so a bad stretch of dates cannot stall the range
+    fetcher.manifest.max_attempts = (
+        config.MAX_FETCH_ATTEMPTS + config.BACKFILL_RETRY_ATTEMPTS
+    )
+    retried = 0
+    try:
+        for attempt in range(config.BACKFILL_RETRY_ATTEMPTS):
+            keys = list(fetcher.manifest.plan(_failed_keys(fetcher, keys)))
+            if not keys or fetcher.stop_requested:
+                break
+            logger.info(f"Retry pass {attempt + 1}: {len(keys)} failed keys")
+            retried += len(keys)
+            await fetcher.fetch_keys(client, executor, keys)
+    finally:
+        fetcher.manifest.max_attempts = config.MAX_FETCH_ATTEMPTS
+    return retried
+
+
+async def run_backfill(config: AppConfig) -> BackfillReport:
+    fetcher = AQIDataFetcher(config)
+    fetcher.manifest.load(data_dir=config.OUTPUT_DIR)
+    checkpoint = BackfillCheckpoint(config.BACKFILL_CHECKPOINT_PATH, config).load()
+    chunks = split_range(config.START_DATE, config.END_DATE, config.BACKFILL_CHUNK_DAYS)
+    all_keys = _chunk_keys(config, config.START_DATE, config.END_DATE)
+    report = BackfillReport(chunks=len(chunks))
+    logger.info(
+        f"Backfill {config.START_DATE} - {config.END_DATE}: {len(chunks)} chunks, "
+        f"{len(checkpoint.chunks)} already done"
+    )
+
+    _install_stop_handlers(fetcher)
+    try:
+        async with fetcher.open_session() as (client, executor):
+            for chunk_start, chunk_end in chunks:
+                if checkpoint.is_done(chunk_start):
+                    report.skipped_chunks += 1
+                    continue
+                keys = _chunk_keys(config, chunk_start, chunk_end)
+                logger.info(f"Backfilling {chunk_start} - {chunk_end}")
+                await fetcher.fetch_keys(client, executor, fetcher.manifest.plan(keys))
+                if fetcher.stop_requested:
+                    break
+                # The manifest is compacted before the chunk is marked, so a
+                # chunk recorded as done always has its entries on disk
+                fetcher.manifest.compact()
+                checkpoint.mark_done(
+                    chunk_start, chunk_end, len(_failed_keys(fetcher, keys))
+                )
+                report.fetched_chunks.append(chunk_start)
+
+            if not fetcher.stop_requested and not checkpoint.retry_done:
+                report.retried = await _retry_pass(
+                    config, fetcher, client, executor, all_keys
+                )
+                # Keys still failing get another pass on the next run; the
+                # manifest's attempt cap keeps that from repeating forever
+                if not fetcher.stop_requested and not _failed_keys(fetcher, all_keys):
+                    checkpoint.retry_done = True
+                    checkpoint.save()
+    finally:
+        _remove_stop_handlers()
+
+    report.still_failed = len(_failed_keys(fetcher, all_keys))
+    report.interrupted = fetcher.stop_requested
+    if report.interrupted:
+        logger.warning("Backfill interrupted; run again to resume from checkpoint")
+    else:
+        logger.success(
+            f"Backfill completed: {len(report.fetched_chunks)} chunks fetched, "
+            f"{report.skipped_chunks} skipped, {report.still_failed} keys still failed"
+        )
+    return report
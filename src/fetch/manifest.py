@@ -0,0 +1,223 @@
+import json
+import re
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import jdatetime
+import pyarrow.parquet as pq
+from loguru import logger
+
+from ..config import normalize_time
+from ..schema import LEGACY_DEFAULTS
+
+ManifestKey = Tuple[str, str, int]
+
+LEGACY_FILE_PATTERN = re.compile(r"aqi_(\d{4})_(\d{2})_(\d{2})\.parquet$")
+PARTITION_PATTERN = re.compile(r"^(type|time|hour)=(\d+)$")
+COMPACTED_FILE_SUFFIX = "_compacted.parquet"
+SNAPSHOT_COLUMNS = ["jalali_date", "snapshot_time", "region_type"]
+
+
+def _daily_file_key(file: Path, match: re.Match) -> ManifestKey:
+    partitions = dict(
+        m.groups()
+        for part in file.parent.parts[-2:]
+        if (m := PARTITION_PATTERN.match(part))
+    )
+    if "time" in partitions:
+        time = f"{partitions['time'][:2]}:{partitions['time'][2:]}"
+    else:
+        # Files written before minutes were kept sit under hour=HH
+        time = f"{partitions.get('hour', '11')}:00"
+    return (
+        "/".join(match.groups()),
+        normalize_time(time),
+        int(partitions.get("type", 1)),
+    )
+
+
+def _compacted_file_keys(file: Path) -> List[ManifestKey]:
+    # A compacted file merges many snapshots and its path names none of
+    # them, so they are read back from the rows themselves
+    names = pq.read_schema(file).names
+    columns = [col for col in SNAPSHOT_COLUMNS if col in names]
+    snapshots = pq.read_table(file, columns=columns).group_by(columns).aggregate([])
+    keys = []
+    for row in snapshots.to_pylist():
+        if row["jalali_date"] is None:
+            continue
+        values = {
+            col: default if row.get(col) is None else row[col]
+            for col, default in LEGACY_DEFAULTS.items()
+        }
+        keys.append(
+            (
+                row["jalali_date"],
+                normalize_time(values["snapshot_time"]),
+                int(values["region_type"]),
+            )
+        )
+    return keys
+
+
+class FetchStatus(str, Enum):
+    SUCCESS = "success"
+    EMPTY = "empty"
+    FAILED = "failed"
+
+
+@dataclass
+class ManifestEntry:
+    date: str
+    time: str
+    region_type: int
+    status: FetchStatus
+    rows: int = 0
+    content_hash: Optional[str] = None
+    path: Optional[str] = None
+    attempts: int = 1
+    error: Optional[str] = None
+    updated_at: str = ""
+    # When DOE answered; empty for files adopted by the bootstrap
+    fetched_at: str = ""
+
+    @property
+    def key(self) -> ManifestKey:
+        return self.date, self.time, self.region_type
+
+    @property
+    def snapshot_at(self) -> datetime:
+        day = jdatetime.date(*map(int, self.date.split("/"))).togregorian()
+        hour, minute = map(int, self.time.split(":"))
+        return datetime(day.year, day.month, day.day, hour, minute, tzinfo=timezone.utc)
+
+    def to_json(self) -> str:
+        record = asdict(self)
+        record["status"] = self.status.value
+        return json.dumps(record, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "ManifestEntry":
+        record = json.loads(line)
+        record["status"] = FetchStatus(record["status"])
+        record["time"] = normalize_time(record["time"])
+        return cls(**record)
+
+
+class FetchManifest:
+    def __init__(
+        self,
+        path: Path,
+        max_attempts: int = 3,
+        empty_recheck_days: float = 3,
+        empty_recheck_hours: float = 6,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.empty_recheck = timedelta(days=empty_recheck_days)
+        self.empty_recheck_interval = timedelta(hours=empty_recheck_hours)
+        self.entries: Dict[ManifestKey, ManifestEntry] = {}
+        self._appended = 0
+
+    def load(self, data_dir: Optional[Path] = None) -> "FetchManifest":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = ManifestEntry.from_json(line)
+                    except (ValueError, TypeError, KeyError) as e:
+                        logger.warning(f"Ignoring corrupt manifest line: {e}")
+                        continue
+                    self.entries[entry.key] = entry
+            logger.info(f"Loaded {len(self.entries):,} manifest entries")
+        elif data_dir is not None and data_dir.exists():
+            self._bootstrap_from_files(data_dir)
+        return self
+
+    def _bootstrap_from_files(self, data_dir: Path) -> None:
+        # One directory walk to adopt files written before the manifest existed
+        updated_at = datetime.now(timezone.utc).isoformat()
+        for file in data_dir.rglob("aqi_*.parquet"):
+            if match := LEGACY_FILE_PATTERN.search(file.name):
+                keys = [_daily_file_key(file, match)]
+            elif file.name.endswith(COMPACTED_FILE_SUFFIX):
+                keys = _compacted_file_keys(file)
+            else:
+                continue
+            for date, time, region_type in keys:
+                entry = ManifestEntry(
+                    date=date,
+                    time=time,
+                    region_type=region_type,
+                    status=FetchStatus.SUCCESS,
+                    path=str(file),
+                    updated_at=updated_at,
+                )
+                self.entries[entry.key] = entry
+        if self.entries:
+            self._appended = len(self.entries)
+            self.compact()
+        logger.info(f"Bootstrapped manifest with {len(self.entries):,} existing files")
+
+    def get(self, key: ManifestKey) -> Optional[ManifestEntry]:
+        return self.entries.get(key)
+
+    def _empty_may_fill(self, entry: ManifestEntry, now: datetime) -> bool:
+        # DOE publishes a day with a delay, so asking too early answers
+        # "no data" for a day that fills in later. An empty answer is
+        # final once it came at least empty_recheck after the snapshot;
+        # before that it is asked again, at most once per interval
+        fetched_at = datetime.fromisoformat(entry.fetched_at or entry.updated_at)
+        if fetched_at - entry.snapshot_at >= self.empty_recheck:
+            return False
+        return now - fetched_at >= self.empty_recheck_interval
+
+    def needs_fetch(self, key: ManifestKey, now: Optional[datetime] = None) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return True
+        if entry.status == FetchStatus.FAILED:
+            return entry.attempts < self.max_attempts
+        if entry.status == FetchStatus.EMPTY:
+            return self._empty_may_fill(entry, now or datetime.now(timezone.utc))
+        return False
+
+    def plan(self, keys: Iterable[ManifestKey]) -> Iterator[ManifestKey]:
+        now = datetime.now(timezone.utc)
+        return (key for key in keys if self.needs_fetch(key, now))
+
+    def record(self, entry: ManifestEntry) -> None:
+        previous = self.entries.get(entry.key)
+        if previous is not None and previous.status in (
+            FetchStatus.FAILED,
+            entry.status,
+        ):
+            entry.attempts = previous.attempts + 1
+        entry.updated_at = entry.fetched_at = datetime.now(timezone.utc).isoformat()
+        self.entries[entry.key] = entry
+
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(entry.to_json() + "\n")
+        self._appended += 1
+
+    def compact(self) -> None:
+        if not self._appended or not self.entries:
+            return
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(entry.to_json() + "\n")
+        tmp_path.replace(self.path)
+        self._appended = 0
+
+    def summary(self) -> Dict[str, int]:
+        counts = {status.value: 0 for status in FetchStatus}
+        for entry in self.entries.values():
+            counts[entry.status.value] += 1
+        return counts
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from loguru import logger
+
+
+@dataclass
+class StageStats:
+    name: str
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    queue_depth_total: int = 0
+    queue_samples: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    def observe_queue(self, queue: asyncio.Queue) -> None:
+        depth = queue.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self.queue_depth_total += depth
+        self.queue_samples += 1
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        self.busy_seconds += seconds
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return max(end - self.started_at, 1e-9)
+
+    def report(self) -> Dict[str, Any]:
+        total = self.processed + self.failed
+        return {
+            "stage": self.name,
+            "processed": self.processed,
+            "failed": self.failed,
+            "throughput_per_s": round(total / self.elapsed, 2),
+            "avg_item_seconds": round(self.busy_seconds / total, 4) if total else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_queue_depth": (
+                round(self.queue_depth_total / self.queue_samples, 2)
+                if self.queue_samples
+                else 0.0
+            ),
+        }
+
+    def log(self) -> None:
+        logger.info(f"Stage stats: {self.report()}")
@@ -0,0 +1,147 @@
+import asyncio
+from enum import Enum
+from time import monotonic
+from typing import Any, Dict, List, Tuple
+
+from loguru import logger
+
+
+class Outcome(str, Enum):
+    OK = "ok"
+    OVERLOAD = "overload"
+    ERROR = "error"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = monotonic()
+        self.waited_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        # The lock keeps waiters in FIFO order so retries cannot starve new work
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                wait = (tokens - self.tokens) / self.rate
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= tokens
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_tolerance: float = 2.0,
+        decrease_factor: float = 0.7,
+        smoothing: float = 0.2,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.smoothing = smoothing
+
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self.baseline_latency: float | None = None
+        self.smoothed_latency: float | None = None
+        self.last_decrease = 0.0
+        self.counts = {outcome.value: 0 for outcome in Outcome}
+        self.started_at = monotonic()
+        self.history: List[Tuple[float, int]] = [(0.0, self.current_limit)]
+        self._condition = asyncio.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.current_limit)
+            self.in_flight += 1
+
+    async def release(self, latency: float, outcome: Outcome) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self.counts[outcome.value] += 1
+            self._update(latency, outcome)
+            self._condition.notify_all()
+
+    def _update(self, latency: float, outcome: Outcome) -> None:
+        previous = self.current_limit
+
+        if outcome == Outcome.OK:
+            self.smoothed_latency = (
+                latency
+                if self.smoothed_latency is None
+                else self.smoothed_latency
+                + self.smoothing * (latency - self.smoothed_latency)
+            )
+            self.baseline_latency = (
+                latency
+                if self.baseline_latency is None
+                else min(self.baseline_latency, latency)
+            )
+
+        slow = (
+            outcome == Outcome.OK
+            and self.baseline_latency is not None
+            and self.smoothed_latency > self.baseline_latency * self.latency_tolerance
+        )
+
+        if outcome == Outcome.OVERLOAD or slow:
+            # At most one decrease per smoothed round trip, otherwise a burst
+            # of failures from the same window collapses the limit to min
+            now = monotonic()
+            if now - self.last_decrease >= (self.smoothed_latency or latency):
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self.last_decrease = now
+                if slow:
+                    # Let the baseline drift up so a permanently slower server
+                    # is not treated as overloaded forever
+                    self.baseline_latency *= 1.1
+        elif outcome == Outcome.OK and (self.in_flight + 1) * 2 >= self.limit:
+            # Only grow while the limit is actually the bottleneck
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        if self.current_limit != previous:
+            self.history.append(
+                (round(monotonic() - self.started_at, 3), self.current_limit)
+            )
+
+    def report(self) -> Dict[str, Any]:
+        limits = [limit for _, limit in self.history]
+        return {
+            "current_limit": self.current_limit,
+            "min_seen": min(limits),
+            "max_seen": max(limits),
+            "baseline_latency": self.baseline_latency,
+            "smoothed_latency": self.smoothed_latency,
+            "outcomes": self.counts,
+            "history": self.history,
+        }
+
+    def log(self) -> None:
+        report = self.report()
+        logger.info(
+            f"Concurrency limit {report['current_limit']} "
+            f"(range {report['min_seen']}-{report['max_seen']}, "
+            f"outcomes {report['outcomes']}, {len(self.history)} changes)"
+        )
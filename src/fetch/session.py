@@ -0,0 +1,96 @@
+from importlib.util import find_spec
+from time import perf_counter
+from typing import Dict, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from ..config import AppConfig
+from ..metrics import METRICS, increment
+
+# Each phase runs from the first listed start event that fired to the first
+# listed end event that fired; phases an attempt skipped (connect on a reused
+# connection) are not reported
+ATTEMPT_PHASES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "http_pool_wait": (
+        ("attempt",),
+        ("connect_tcp.started", "send_request_headers.started"),
+    ),
+    "http_connect": (
+        ("connect_tcp.started",),
+        ("start_tls.complete", "connect_tcp.complete"),
+    ),
+    "http_send": (
+        ("send_request_headers.started",),
+        ("send_request_body.complete", "send_request_headers.complete"),
+    ),
+    "http_server": (
+        ("send_request_body.complete", "send_request_headers.complete"),
+        ("receive_response_headers.complete",),
+    ),
+    "http_receive": (
+        ("receive_response_headers.complete",),
+        ("receive_response_body.complete",),
+    ),
+}
+
+
+class AttemptTimer:
+    def __init__(self):
+        self.marks: Dict[str, float] = {"attempt": perf_counter()}
+
+    async def __call__(self, event: str, info: dict) -> None:
+        # httpcore names events "<layer>.<step>.<started|complete|failed>";
+        # the layer (connection, http11, http2) does not matter here
+        _, step = event.split(".", 1)
+        self.marks.setdefault(step, perf_counter())
+        if step == "connect_tcp.complete":
+            increment("http_connections")
+
+    def _first(self, events: Tuple[str, ...]) -> Optional[float]:
+        return next((self.marks[e] for e in events if e in self.marks), None)
+
+    def phases(self) -> Dict[str, float]:
+        phases = {}
+        for name, (starts, ends) in ATTEMPT_PHASES.items():
+            start, end = self._first(starts), self._first(ends)
+            if start is not None and end is not None:
+                phases[name] = end - start
+        return phases
+
+    def record(self, ok: bool) -> None:
+        for name, seconds in self.phases().items():
+            METRICS.observe(name, seconds, ok)
+
+
+def http2_available(requested: bool) -> bool:
+    if requested and find_spec("h2") is None:
+        logger.warning("HTTP2=true but h2 is not installed; using HTTP/1.1")
+        return False
+    return requested
+
+
+def create_client(config: AppConfig) -> httpx.AsyncClient:
+    # One connection per concurrent request, all kept alive between dates so
+    # a long backfill does not pay connection setup on every request
+    limits = httpx.Limits(
+        max_connections=config.MAX_CONCURRENT,
+        max_keepalive_connections=config.MAX_CONCURRENT,
+        keepalive_expiry=config.KEEPALIVE_EXPIRY,
+    )
+    # Retries are left to the fetcher's backoff so there is a single budget
+    transport = httpx.AsyncHTTPTransport(
+        retries=0, limits=limits, http2=http2_available(config.HTTP2)
+    )
+    timeout = httpx.Timeout(
+        connect=config.CONNECT_TIMEOUT,
+        read=config.READ_TIMEOUT,
+        write=config.CONNECT_TIMEOUT,
+        pool=config.READ_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        headers=config.HEADERS,
+        cookies=config.COOKIES,
+        transport=transport,
+        timeout=timeout,
+    )
@@ -1,12 +1,51 @@
+from __future__ import annotations
+
+import hashlib
 import re
+from array import array
 from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from itertools import product
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 
 import jdatetime
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
 
+from ..config import normalize_time
 from ..constants import AQIColumns
+from ..metrics import instrumented
+from ..schema import AQI_SCHEMA, jalali_to_gregorian
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+MS_DATE_PATTERN = r"/Date\((?P<ms>-?\d+)\)/"
+DATE_COLUMNS = ["CreateDate", "ModifyDate", "Date"]
+
+# Wire types of the response fields we keep; everything else in a row is
+# skipped by the parser instead of being materialized
+RESPONSE_FIELDS = pa.struct(
+    [
+        ("Id", pa.int64()),
+        ("StateId", pa.int64()),
+        ("RegionId", pa.int64()),
+        *[(name, pa.float64()) for name in ("CO", "O3", "NO2", "SO2", "PM10")],
+        ("PM2_5", pa.float64()),
+        ("AQI", pa.float64()),
+        ("Pollutant", pa.string()),
+        ("StateName_Fa", pa.string()),
+        ("StateName_En", pa.string()),
+        ("Region_Fa", pa.string()),
+        ("Region_En", pa.string()),
+        ("RegionLatitude", pa.float64()),
+        ("RegionLongitude", pa.float64()),
+        *[(name, pa.string()) for name in DATE_COLUMNS],
+    ]
+)
+RESPONSE_SCHEMA = pa.schema([("Data", pa.list_(RESPONSE_FIELDS))])
 
 
 def convert_ms_date(ms_date_str: str) -> str | None:
@@ -18,6 +57,38 @@ def convert_ms_date(ms_date_str: str) -> str | None:
     ).isoformat()
 
 
+def parse_ms_dates(text: pa.Array) -> pa.Array:
+    matches = pc.extract_regex(text, MS_DATE_PATTERN)
+    millis = pc.cast(pc.struct_field(matches, "ms"), pa.int64())
+    return pc.cast(millis, pa.timestamp("ms", tz="UTC"))
+
+
+@instrumented("convert_ms_dates")
+def convert_ms_dates(series: pd.Series, as_string: bool = False) -> pd.Series:
+    import pandas as pd
+
+    text = pa.array(series.astype("string"), type=pa.string(), from_pandas=True)
+    timestamps = parse_ms_dates(text)
+    if not as_string:
+        return pd.Series(timestamps.to_pandas().array, index=series.index)
+
+    # Same text as datetime.isoformat(): fractional part only when non-zero
+    whole_seconds = pc.cast(
+        pc.floor_temporal(timestamps, unit="second"), pa.timestamp("s", tz="UTC")
+    )
+    seconds = pc.strftime(whole_seconds, format="%Y-%m-%dT%H:%M:%S")
+    fraction = pc.subtract(
+        pc.cast(timestamps, pa.int64()),
+        pc.multiply(pc.cast(whole_seconds, pa.int64()), 1000),
+    )
+    micros = pc.utf8_lpad(pc.cast(pc.multiply(fraction, 1000), pa.string()), 6, "0")
+    suffix = pc.if_else(
+        pc.greater(fraction, 0), pc.binary_join_element_wise(".", micros, ""), ""
+    )
+    iso = pc.binary_join_element_wise(seconds, suffix, "+00:00", "")
+    return pd.Series(iso.to_pylist(), index=series.index, dtype=object)
+
+
 def generate_jalali_dates(start: str, end: str) -> List[str]:
     start_j = jdatetime.datetime.strptime(start, "%Y/%m/%d")
     end_j = jdatetime.datetime.strptime(end, "%Y/%m/%d")
@@ -27,20 +98,125 @@ def generate_jalali_dates(start: str, end: str) -> List[str]:
     ]
 
 
-def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+def process_dataframe(df: pd.DataFrame, dates_as_string: bool = False) -> pd.DataFrame:
     available_columns = [col for col in AQIColumns.MAPPING]
-    date_columns = ["CreateDate", "ModifyDate", "Date"]
 
     df = df.loc[:, available_columns].copy()
-    for col in date_columns:
-        df.loc[:, col] = df[col].apply(convert_ms_date)
+    for col in DATE_COLUMNS:
+        df[col] = convert_ms_dates(df[col], as_string=dates_as_string)
 
     df = df.rename(columns=AQIColumns.MAPPING)
+    df["gregorian_date"] = jalali_to_gregorian(df["jalali_date"])
     return df
 
 
-def build_output_path(base_dir: Path, date: str) -> Path:
+def _sorted_dictionary(values: pa.Array, ordered: bool = False) -> pa.Array:
+    # Sorted like the categories pandas would build, so files match the ones
+    # written through process_dataframe
+    uniques = pc.drop_null(pc.unique(values))
+    dictionary = pc.take(uniques, pc.array_sort_indices(uniques))
+    indices = pc.index_in(values, value_set=dictionary)
+    return pa.DictionaryArray.from_arrays(indices, dictionary, ordered=ordered)
+
+
+# Typecodes for the fixed-width constants decode_response adds
+_CONSTANT_TYPECODES = {pa.int8(): "b", pa.date32(): "i"}
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def _constant(value: object, arrow_type: pa.DataType, length: int) -> pa.Array:
+    # Built from raw buffers: converting Python values (pa.array, pa.scalar)
+    # makes pyarrow import pandas, which the fetch path otherwise never needs
+    if pa.types.is_dictionary(arrow_type):
+        text = str(value).encode()
+        dictionary = pa.Array.from_buffers(
+            pa.string(),
+            1,
+            [None, pa.py_buffer(array("i", [0, len(text)])), pa.py_buffer(text)],
+        )
+        indices = pa.Array.from_buffers(
+            pa.int32(), length, [None, pa.py_buffer(bytes(4 * length))]
+        )
+        return pa.DictionaryArray.from_arrays(
+            indices, dictionary, ordered=arrow_type.ordered
+        )
+    if arrow_type == pa.date32():
+        value = value.toordinal() - _EPOCH_ORDINAL
+    values = array(_CONSTANT_TYPECODES[arrow_type], [value]) * length
+    return pa.Array.from_buffers(arrow_type, length, [None, pa.py_buffer(values)])
+
+
+@instrumented("decode_response")
+def decode_response(raw: bytes, key: Tuple[str, str, int]) -> Optional[pa.Table]:
+    # Raises pa.ArrowInvalid when the payload does not fit RESPONSE_SCHEMA,
+    # e.g. a numeric field sent as text; callers fall back to the row path
+    parsed = pj.read_json(
+        BytesIO(raw),
+        read_options=pj.ReadOptions(use_threads=False, block_size=len(raw) + 1),
+        parse_options=pj.ParseOptions(
+            explicit_schema=RESPONSE_SCHEMA, unexpected_field_behavior="ignore"
+        ),
+    )
+    data = parsed.column("Data").combine_chunks()
+    if len(data) != 1 or not data.is_valid()[0].as_py():
+        return None
+    rows = pc.list_flatten(data)
+    if not len(rows):
+        return None
+
+    requested = dict(zip(("requested_date", "requested_time", "requested_type"), key))
+    columns = {}
+    for source, name in AQIColumns.MAPPING.items():
+        arrow_type = AQI_SCHEMA.field(name).type
+        if source in requested:
+            columns[name] = _constant(requested[source], arrow_type, len(rows))
+            continue
+        values = pc.struct_field(rows, source)
+        if source in DATE_COLUMNS:
+            values = parse_ms_dates(values)
+        if pa.types.is_dictionary(arrow_type):
+            columns[name] = _sorted_dictionary(values, arrow_type.ordered)
+        else:
+            columns[name] = pc.cast(values, arrow_type)
+
+    year, month, day = map(int, key[0].split("/"))
+    columns["gregorian_date"] = _constant(
+        jdatetime.date(year, month, day).togregorian(), pa.date32(), len(rows)
+    )
+    return pa.Table.from_pydict(columns, schema=AQI_SCHEMA)
+
+
+def generate_fetch_keys(
+    dates: List[str], times: List[str], region_types: List[int]
+) -> Iterator[Tuple[str, str, int]]:
+    # Dates vary fastest so the snapshots of one day are spread across the run
+    # instead of queueing back to back behind a single slow day
+    for time, region_type in product(times, region_types):
+        for date in dates:
+            yield date, time, region_type
+
+
+def build_output_path(
+    base_dir: Path, date: str, time: str = "11:00", region_type: int = 1
+) -> Path:
     year, month, _ = date.split("/")
-    subdir = base_dir / f"year={year}" / f"month={month}"
-    subdir.mkdir(parents=True, exist_ok=True)
+    # HHMM: snapshots within the same hour need directories of their own
+    snapshot = normalize_time(time).replace(":", "")
+    subdir = (
+        base_dir
+        / f"year={year}"
+        / f"month={month}"
+        / f"type={region_type}"
+        / f"time={snapshot}"
+    )
     return subdir / f"aqi_{date.replace('/', '_')}.parquet"
+
+
+def hash_table(table: pa.Table) -> str:
+    # Hashes the Arrow IPC encoding, without pandas metadata, so the same
+    # rows decoded the same way always give the same digest
+    table = table.replace_schema_metadata(None).combine_chunks()
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return hashlib.sha256(sink.getvalue()).hexdigest()
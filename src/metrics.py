@@ -0,0 +1,271 @@
+import cProfile
+import inspect
+import io
+import json
+import multiprocessing
+import os
+import pstats
+import re
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+REPORT_FILE = "run_report.json"
+PROMETHEUS_FILE = "metrics.prom"
+
+
+@dataclass
+class SpanStats:
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        self.count += 1
+        self.errors += not ok
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def merge(self, other: "SpanStats") -> None:
+        self.count += other.count
+        self.errors += other.errors
+        self.total_seconds += other.total_seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 4),
+            "mean_seconds": round(self.total_seconds / max(1, self.count), 6),
+            "max_seconds": round(self.max_seconds, 4),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans: Dict[str, SpanStats] = {}
+        self.counters: Dict[str, float] = {}
+        self.started_at = datetime.now(timezone.utc)
+
+        self.profile_stage: Optional[str] = None
+        self.profile_mode: Optional[str] = None
+        self._profile_depth = 0
+        self._profiler: Optional[cProfile.Profile] = None
+        self._memory_peak = 0
+        self._memory_top: List[str] = []
+
+    def configure_profiling(self, stage: Optional[str], mode: str = "cprofile") -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected {PROFILE_MODES}")
+        self.profile_stage = stage or None
+        self.profile_mode = mode
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self.spans.setdefault(name, SpanStats()).observe(seconds, ok)
+
+    def drain(self) -> Dict[str, dict]:
+        # Hands over everything recorded so far and starts again from zero
+        with self._lock:
+            snapshot = {"spans": self.spans, "counters": self.counters}
+            self.spans, self.counters = {}, {}
+        return snapshot
+
+    def merge(self, snapshot: Optional[Dict[str, dict]]) -> None:
+        if not snapshot:
+            return
+        with self._lock:
+            for name, stats in snapshot["spans"].items():
+                self.spans.setdefault(name, SpanStats()).merge(stats)
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def _reset_after_fork(self) -> None:
+        # A forked worker starts with a copy of the parent's figures; only
+        # what it records itself may be sent back
+        self._lock = threading.Lock()
+        self.spans, self.counters = {}, {}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        profiled = name == self.profile_stage
+        if profiled:
+            self._start_profile()
+        started = perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.observe(name, perf_counter() - started, ok)
+            if profiled:
+                self._stop_profile()
+
+    def _start_profile(self) -> None:
+        with self._lock:
+            self._profile_depth += 1
+            if self._profile_depth > 1:
+                return
+            if self.profile_mode == "tracemalloc":
+                tracemalloc.start()
+                tracemalloc.reset_peak()
+                return
+            # cProfile follows the thread that entered the span first; stages
+            # run concurrently on other threads are not attributed to it
+            self._profiler = self._profiler or cProfile.Profile()
+            self._profiler.enable()
+
+    def _stop_profile(self) -> None:
+        with self._lock:
+            self._profile_depth -= 1
+            if self._profile_depth:
+                return
+            if self.profile_mode == "tracemalloc":
+                _, peak = tracemalloc.get_traced_memory()
+                if peak >= self._memory_peak:
+                    self._memory_peak = peak
+                    top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+                    self._memory_top = [str(stat) for stat in top]
+                tracemalloc.stop()
+                return
+            self._profiler.disable()
+
+    def _profile_report(self, output_dir: Optional[Path]) -> Optional[dict]:
+        if self.profile_stage is None:
+            return None
+        report = {"stage": self.profile_stage, "mode": self.profile_mode}
+        if self.profile_mode == "tracemalloc":
+            report["peak_mb"] = round(self._memory_peak / 2**20, 2)
+            report["top_allocations"] = self._memory_top
+        elif self._profiler is not None:
+            buffer = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=buffer)
+            stats.sort_stats("cumulative").print_stats(20)
+            report["top_functions"] = buffer.getvalue().splitlines()
+            if output_dir is not None:
+                profile_path = output_dir / f"profile_{self.profile_stage}.prof"
+                stats.dump_stats(profile_path)
+                report["profile_path"] = str(profile_path)
+        return report
+
+    def report(self, output_dir: Optional[Path] = None) -> dict:
+        with self._lock:
+            spans = {name: stats.report() for name, stats in self.spans.items()}
+            counters = dict(self.counters)
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "spans": spans,
+            "counters": counters,
+            "profile": self._profile_report(output_dir),
+        }
+
+    def prometheus_text(self, prefix: str = "aqi") -> str:
+        with self._lock:
+            spans = dict(self.spans)
+            counters = dict(self.counters)
+
+        lines = []
+        span_metrics = [
+            ("span_calls_total", "counter", "Calls per span", "count"),
+            ("span_errors_total", "counter", "Failed calls per span", "errors"),
+            ("span_seconds_total", "counter", "Time spent per span", "total_seconds"),
+            ("span_max_seconds", "gauge", "Slowest call per span", "max_seconds"),
+        ]
+        for metric, kind, help_text, attr in span_metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, stats in sorted(spans.items()):
+                lines.append(
+                    f'{prefix}_{metric}{{span="{name}"}} {getattr(stats, attr):g}'
+                )
+        for name, value in sorted(counters.items()):
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, output_dir: Path) -> Tuple[Path, Path]:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report_path = output_dir / REPORT_FILE
+        prometheus_path = output_dir / PROMETHEUS_FILE
+        report_path.write_text(
+            json.dumps(self.report(output_dir), indent=2), encoding="utf-8"
+        )
+        prometheus_path.write_text(self.prometheus_text(), encoding="utf-8")
+        return report_path, prometheus_path
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+METRICS = MetricsRegistry()
+os.register_at_fork(after_in_child=METRICS._reset_after_fork)
+
+
+def span(name: str):
+    return METRICS.span(name)
+
+
+def increment(name: str, value: float = 1) -> None:
+    METRICS.increment(name, value)
+
+
+def instrumented(name: str):
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with METRICS.span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with METRICS.span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def call_collected(fn: Callable, *args, **kwargs) -> Tuple[Any, Optional[dict]]:
+    # Pool tasks go through here: a worker process's registry dies with the
+    # worker, so what the task recorded travels back with its result (or
+    # its exception) for merge_collected to add to the parent's
+    if multiprocessing.parent_process() is None:
+        return fn(*args, **kwargs), None
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        e.worker_metrics = METRICS.drain()
+        raise
+    return result, METRICS.drain()
+
+
+def merge_collected(collected: Tuple[Any, Optional[dict]]) -> Any:
+    result, snapshot = collected
+    METRICS.merge(snapshot)
+    return result
+
+
+def merge_failed(error: BaseException) -> None:
+    METRICS.merge(getattr(error, "worker_metrics", None))
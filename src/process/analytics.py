@@ -0,0 +1,201 @@
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+from ..schema import decode_jalali_dates
+from .data_processor import AQI_BINS, AQI_LEVELS, DERIVATION_VERSION
+from .processed_layer import (
+    ProcessedLayerReport,
+    load_processed_aqi_data,
+    load_state,
+    save_state,
+    source_fingerprints,
+    update_processed_layer,
+)
+
+ANALYTICS_COLUMNS = [
+    "region_id",
+    "region_name_en",
+    "jalali_date",
+    "gregorian_date",
+    "aqi",
+]
+ROLLING_WINDOWS = {"aqi_7d": "7D", "aqi_30d": "30D"}
+CLIMATOLOGY_QUANTILES = {
+    "p10": 0.1,
+    "p25": 0.25,
+    "median": 0.5,
+    "p75": 0.75,
+    "p90": 0.9,
+}
+TABLES = ("rolling", "exceedance", "climatology")
+STATE_FILE = "_analytics_state.json"
+
+# Bump when the tables' layout or the statistics above change
+ANALYTICS_VERSION = f"1.{DERIVATION_VERSION}"
+
+
+def daily_region_aqi(df: pd.DataFrame) -> pd.DataFrame:
+    # Several snapshots per day collapse to one daily mean per region
+    daily = (
+        df.dropna(subset=["aqi"])
+        .groupby(["region_id", "gregorian_date"], observed=True, sort=True)
+        .agg(
+            region_name_en=("region_name_en", "first"),
+            jalali_date=("jalali_date", "first"),
+            aqi=("aqi", "mean"),
+        )
+        .reset_index()
+    )
+    daily["year"], daily["day_of_year"] = decode_jalali_dates(daily["jalali_date"])
+    return daily
+
+
+def rolling_means(daily: pd.DataFrame) -> pd.DataFrame:
+    rolling = daily[
+        ["region_id", "region_name_en", "jalali_date", "gregorian_date", "aqi"]
+    ].copy()
+    by_region = daily.set_index("gregorian_date").groupby("region_id", sort=True)["aqi"]
+    for column, window in ROLLING_WINDOWS.items():
+        # Time-based windows, so gaps in the archive do not stretch the mean
+        rolling[column] = (
+            by_region.rolling(window, min_periods=1).mean().to_numpy(np.float32)
+        )
+    return rolling
+
+
+def exceedance_counts(daily: pd.DataFrame) -> pd.DataFrame:
+    levels = pd.cut(daily["aqi"], bins=AQI_BINS, labels=AQI_LEVELS, include_lowest=True)
+    counts = (
+        daily.assign(aqi_level=levels)
+        .groupby(["region_id", "year", "aqi_level"], observed=False)
+        .size()
+        .unstack("aqi_level", fill_value=0)
+    )
+    counts = counts[counts.sum(axis=1) > 0]
+    # Reverse cumulative sum: days at or above each band's lower bound
+    at_or_above = counts.iloc[:, ::-1].cumsum(axis=1).iloc[:, ::-1]
+
+    exceedance = counts.stack().rename("days").to_frame()
+    exceedance["days_at_or_above"] = at_or_above.stack()
+    exceedance["observed_days"] = exceedance.groupby(level=["region_id", "year"])[
+        "days"
+    ].transform("sum")
+    return exceedance.reset_index()
+
+
+def day_of_year_climatology(daily: pd.DataFrame) -> pd.DataFrame:
+    current_year = daily["year"].max()
+    history = daily[daily["year"] < current_year]
+    keys = ["region_id", "day_of_year"]
+
+    by_day = history.groupby(keys, sort=True)["aqi"]
+    climatology = by_day.quantile(list(CLIMATOLOGY_QUANTILES.values())).unstack()
+    climatology.columns = list(CLIMATOLOGY_QUANTILES)
+    climatology["years"] = by_day.size()
+
+    current = daily[daily["year"] == current_year].set_index(keys)["aqi"]
+    climatology = climatology.join(current.rename("current_aqi"), how="outer")
+    climatology["current_year"] = current_year
+    climatology["anomaly"] = climatology["current_aqi"] - climatology["median"]
+    return climatology.reset_index()
+
+
+def compute_aqi_analytics(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    daily = daily_region_aqi(df)
+    names = daily.groupby("region_id", sort=False)["region_name_en"].first()
+    tables = {
+        "rolling": rolling_means(daily),
+        "exceedance": exceedance_counts(daily),
+        "climatology": day_of_year_climatology(daily),
+    }
+    for table in tables.values():
+        if "region_name_en" not in table.columns:
+            table.insert(
+                1,
+                "region_name_en",
+                pd.Categorical(table["region_id"].map(names).astype(str)),
+            )
+    return tables
+
+
+def _compact_table(df: pd.DataFrame) -> pa.Table:
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+        elif col in ("year", "current_year", "day_of_year"):
+            df[col] = df[col].astype(np.int16)
+        elif col in ("days", "days_at_or_above", "observed_days", "years"):
+            df[col] = df[col].fillna(0).astype(np.int16)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_table(df: pd.DataFrame, path: Path) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    pq.write_table(_compact_table(df), tmp_path, compression="zstd")
+    tmp_path.replace(path)
+
+
+def update_aqi_analytics(
+    input_dir: Union[str, Path],
+    processed_dir: Union[str, Path],
+    analytics_dir: Union[str, Path],
+    processed: Optional[ProcessedLayerReport] = None,
+) -> Dict[str, Path]:
+    if processed is None:
+        processed = update_processed_layer(input_dir, processed_dir)
+    analytics_path = Path(analytics_dir)
+    analytics_path.mkdir(parents=True, exist_ok=True)
+    outputs = {name: analytics_path / f"{name}.parquet" for name in TABLES}
+
+    # Every table depends on the whole archive, so they are rebuilt together,
+    # and only when a processed file changed since they were written
+    state_path = analytics_path / STATE_FILE
+    state = {
+        "version": ANALYTICS_VERSION,
+        "sources": source_fingerprints(processed_dir),
+    }
+    if load_state(state_path) == state and all(
+        path.exists() for path in outputs.values()
+    ):
+        logger.info("Analytics up to date")
+        return outputs
+
+    logger.info("Computing AQI analytics")
+    df = load_processed_aqi_data(
+        input_dir, processed_dir, columns=ANALYTICS_COLUMNS, processed=processed
+    )
+    if df.empty:
+        logger.warning("No data available for analytics")
+        return {}
+
+    for name, table in compute_aqi_analytics(df).items():
+        _write_table(table, outputs[name])
+        logger.info(
+            f"Analytics table {name}: {len(table):,} rows, "
+            f"{outputs[name].stat().st_size / 1024:.1f} KB"
+        )
+    save_state(state_path, state)
+    logger.success(f"Analytics written to: {analytics_path}")
+    return outputs
+
+
+def load_analytics_table(
+    analytics_dir: Union[str, Path],
+    name: str,
+    regions: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    if name not in TABLES:
+        raise ValueError(f"Unknown analytics table {name!r}, expected one of {TABLES}")
+    filters = None
+    if regions:
+        filters = [("region_name_en", "in", list(regions))]
+    return pq.read_table(
+        Path(analytics_dir) / f"{name}.parquet", filters=filters
+    ).to_pandas()
@@ -0,0 +1,128 @@
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Union
+
+import pandas as pd
+import pyarrow.parquet as pq
+from loguru import logger
+
+from ..schema import enforce_schema, to_arrow_table
+
+DAILY_FILE_PATTERN = re.compile(r"^aqi_\d{4}_\d{2}_\d{2}\.parquet$")
+SORT_COLUMNS = ["region_id", "jalali_date", "snapshot_time"]
+SNAPSHOT_KEY = ["jalali_date", "snapshot_time", "region_type"]
+
+
+@dataclass
+class CompactionResult:
+    partition: Path
+    compacted_file: Path
+    merged_files: int
+    rows: int
+
+
+def compacted_file_name(partition_dir: Path) -> str:
+    depth = 2 if partition_dir.name.startswith("month=") else 1
+    values = [part.split("=", 1)[1] for part in partition_dir.parts[-depth:]]
+    return f"aqi_{'_'.join(values)}_compacted.parquet"
+
+
+def _find_partitions(base_path: Path, granularity: str) -> List[Path]:
+    pattern = "year=*/month=*" if granularity == "month" else "year=*"
+    return sorted(p for p in base_path.glob(pattern) if p.is_dir())
+
+
+def _is_mergeable(path: Path) -> bool:
+    # Month files nested under a year partition are merged like dailies when
+    # switching to yearly compaction
+    return bool(DAILY_FILE_PATTERN.match(path.name)) or path.name.endswith(
+        "_compacted.parquet"
+    )
+
+
+def _read_conformed(path: Path) -> pd.DataFrame:
+    df = pq.read_table(path).to_pandas(date_as_object=False)
+    return enforce_schema(df, complete=True)
+
+
+def _remove_empty_dirs(partition_dir: Path) -> None:
+    for subdir in sorted(partition_dir.rglob("*"), reverse=True):
+        if subdir.is_dir() and not any(subdir.iterdir()):
+            subdir.rmdir()
+
+
+def compact_partition(
+    partition_dir: Path, row_group_size: int = 65536
+) -> CompactionResult | None:
+    target = partition_dir / compacted_file_name(partition_dir)
+    dailies = sorted(
+        p for p in partition_dir.rglob("*.parquet") if p != target and _is_mergeable(p)
+    )
+    if not dailies:
+        return None
+
+    new_df = pd.concat([_read_conformed(p) for p in dailies], ignore_index=True)
+    frames = [new_df]
+    if target.exists():
+        # Snapshots that were re-fetched since the last compaction replace
+        # their old rows instead of duplicating them
+        existing = _read_conformed(target)
+        new_keys = pd.MultiIndex.from_frame(new_df[SNAPSHOT_KEY].drop_duplicates())
+        stale = pd.MultiIndex.from_frame(existing[SNAPSHOT_KEY]).isin(new_keys)
+        frames.insert(0, existing[~stale])
+
+    df = (
+        pd.concat(frames, ignore_index=True)
+        .sort_values(SORT_COLUMNS, kind="stable")
+        .reset_index(drop=True)
+    )
+    table = to_arrow_table(df)
+
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    pq.write_table(
+        table,
+        tmp_path,
+        row_group_size=row_group_size,
+        compression="snappy",
+        write_statistics=True,
+        sorting_columns=pq.SortingColumn.from_ordering(
+            table.schema, [(col, "ascending") for col in SORT_COLUMNS]
+        ),
+    )
+    tmp_path.replace(target)
+
+    # Only the files that were read are removed; dailies that landed while
+    # compacting are picked up by the next run
+    for path in dailies:
+        path.unlink()
+    _remove_empty_dirs(partition_dir)
+
+    return CompactionResult(partition_dir, target, len(dailies), len(df))
+
+
+def compact_aqi_data(
+    input_dir: Union[str, Path],
+    granularity: str = "month",
+    row_group_size: int = 65536,
+) -> List[CompactionResult]:
+    if granularity not in ("month", "year"):
+        raise ValueError(f"Unsupported compaction granularity: {granularity}")
+
+    base_path = Path(input_dir).resolve()
+    results = []
+    for partition_dir in _find_partitions(base_path, granularity):
+        try:
+            result = compact_partition(partition_dir, row_group_size)
+        except Exception as e:
+            logger.error(f"Failed to compact {partition_dir}: {e}")
+            continue
+        if result is not None:
+            logger.info(
+                f"Compacted {result.merged_files} files into "
+                f"{result.compacted_file.name} ({result.rows:,} rows)"
+            )
+            results.append(result)
+
+    logger.success(f"Compaction finished: {len(results)} partitions updated")
+    return results
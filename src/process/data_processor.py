@@ -1,10 +1,51 @@
+import operator
+from functools import reduce
 from pathlib import Path
-from typing import Union
+from typing import Iterator, List, Optional, Sequence, Union
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 from loguru import logger
 
+from ..metrics import increment, instrumented
+from ..schema import AQI_SCHEMA, enforce_schema
 
+PARTITION_SCHEMA = pa.schema([("year", pa.int16()), ("month", pa.int8())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+PROCESSING_COLUMNS = ["main_pollutant", "so2", "pm2_5", "aqi"]
+
+# Bump whenever the derivation steps change so persisted results are rebuilt
+DERIVATION_VERSION = 1
+AQI_LEVELS = [
+    "Good",
+    "Moderate",
+    "Unhealthy for Sensitive",
+    "Unhealthy",
+    "Very Unhealthy",
+    "Hazardous",
+]
+# Edges of AQI_LEVELS; each level covers (lower, upper], the first one
+# includes 0
+AQI_BINS = [0, 50, 100, 150, 200, 300, 500]
+DERIVED_SCHEMA = pa.schema(
+    [
+        *[
+            (f"has_{name}", pa.bool_())
+            for name in ("pm2_5", "pm10", "so2", "no2", "o3", "co")
+        ],
+        ("possible_fuel_oil_usage", pa.bool_()),
+        ("aqi_level", pa.dictionary(pa.int8(), pa.string(), ordered=True)),
+    ]
+)
+PROCESSED_SCHEMA = pa.schema([*AQI_SCHEMA, *DERIVED_SCHEMA])
+
+# Rows per record batch in streaming mode; bounds peak memory, not file size
+DEFAULT_BATCH_SIZE = 65536
+
+
+@instrumented("clean_pollutant_names")
 def _clean_pollutant_names(df: pd.DataFrame) -> pd.DataFrame:
     pollutant_mapping = {
         "PM 2.5": "PM2.5",
@@ -28,6 +69,7 @@ def _clean_pollutant_names(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+@instrumented("add_pollutant_indicators")
 def _add_pollutant_indicators(df: pd.DataFrame) -> pd.DataFrame:
     indicators = {
         "PM2.5": ["PM2.5"],
@@ -45,6 +87,7 @@ def _add_pollutant_indicators(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+@instrumented("add_derived_features")
 def _add_derived_features(df: pd.DataFrame) -> pd.DataFrame:
     df["possible_fuel_oil_usage"] = ((df["so2"] > 75) & df["has_so2"]) | (
         (df["pm2_5"] > 100) & df["has_pm2_5"]
@@ -52,51 +95,181 @@ def _add_derived_features(df: pd.DataFrame) -> pd.DataFrame:
 
     df["aqi_level"] = pd.cut(
         df["aqi"],
-        bins=[0, 50, 100, 150, 200, 300, 500],
-        labels=[
-            "Good",
-            "Moderate",
-            "Unhealthy for Sensitive",
-            "Unhealthy",
-            "Very Unhealthy",
-            "Hazardous",
-        ],
+        bins=AQI_BINS,
+        labels=AQI_LEVELS,
         include_lowest=True,
     )
 
     return df
 
 
-def _load_and_combine_data(base_dir: Union[str, Path]) -> pd.DataFrame:
+def _partition_filter(
+    start_date: Optional[str], end_date: Optional[str]
+) -> Optional[pc.Expression]:
+    year, month = pc.field("year"), pc.field("month")
+    expr = None
+    for bound, is_start in ((start_date, True), (end_date, False)):
+        if bound is None:
+            continue
+        y, m, _ = (int(part) for part in bound.split("/"))
+        if is_start:
+            cond = (year > y) | ((year == y) & (month.is_null() | (month >= m)))
+        else:
+            cond = (year < y) | ((year == y) & (month.is_null() | (month <= m)))
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def _row_filter(
+    regions: Optional[Sequence[str]],
+    start_date: Optional[str],
+    end_date: Optional[str],
+) -> Optional[pc.Expression]:
+    conditions = []
+    if regions:
+        conditions.append(pc.field("region_name_en").isin(list(regions)))
+    if start_date:
+        conditions.append(pc.field("jalali_date") >= start_date)
+    if end_date:
+        conditions.append(pc.field("jalali_date") <= end_date)
+    if not conditions:
+        return None
+    return reduce(operator.and_, conditions)
+
+
+def _open_dataset(
+    base_path: Path,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    schema: pa.Schema,
+) -> Optional[ds.Dataset]:
+    dataset = ds.dataset(base_path, format="parquet", partitioning=PARTITIONING)
+    # Partition pruning happens here, before any file footer is opened
+    fragments = list(
+        dataset.get_fragments(filter=_partition_filter(start_date, end_date))
+    )
+    if not fragments:
+        return None
+
+    # Older files are cast to the canonical schema while scanning; columns
+    # they lack come back as nulls and are filled by enforce_schema
+    read_schema = pa.schema([*schema, *PARTITION_SCHEMA])
+    return ds.FileSystemDataset(
+        fragments, read_schema, dataset.format, dataset.filesystem
+    )
+
+
+def _select_columns(
+    dataset: ds.Dataset, columns: Optional[Sequence[str]], schema: pa.Schema
+) -> List[str]:
+    selected = list(columns) if columns is not None else schema.names
+    return [col for col in selected if col in dataset.schema.names]
+
+
+@instrumented("load_and_combine_data")
+def _load_and_combine_data(
+    base_dir: Union[str, Path],
+    columns: Optional[Sequence[str]] = None,
+    regions: Optional[Sequence[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    schema: pa.Schema = AQI_SCHEMA,
+) -> pd.DataFrame:
     base_path = Path(base_dir).resolve()
     logger.info(f"Loading data from: {base_path}")
 
-    parquet_files = list(base_path.rglob("*.parquet"))
-    if not parquet_files:
+    if not base_path.exists():
         logger.warning(f"No parquet files found in: {base_path}")
         return pd.DataFrame()
 
     try:
-        df = pd.read_parquet(parquet_files)
-        logger.success(f"Loaded {len(df):,} records from {len(parquet_files)} files")
+        dataset = _open_dataset(base_path, start_date, end_date, schema)
+        if dataset is None:
+            logger.warning(f"No parquet files found in: {base_path}")
+            return pd.DataFrame()
+
+        table = dataset.to_table(
+            columns=_select_columns(dataset, columns, schema),
+            filter=_row_filter(regions, start_date, end_date),
+        )
+        df = enforce_schema(table.to_pandas(date_as_object=False))
+        increment("rows_loaded", len(df))
+        increment("bytes_loaded", table.nbytes)
+        logger.success(f"Loaded {len(df):,} records from {len(dataset.files)} files")
         return df
-    except Exception as e:
+    except (OSError, pa.ArrowException) as e:
         logger.error(f"Failed to load data: {str(e)}")
         return pd.DataFrame()
 
 
-def process_aqi_data(input_dir: Path) -> pd.DataFrame:
-    logger.info("Starting data processing")
+def iter_aqi_batches(
+    base_dir: Union[str, Path],
+    columns: Optional[Sequence[str]] = None,
+    regions: Optional[Sequence[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    schema: pa.Schema = AQI_SCHEMA,
+) -> Iterator[pd.DataFrame]:
+    base_path = Path(base_dir).resolve()
+    if not base_path.exists():
+        logger.warning(f"No parquet files found in: {base_path}")
+        return
 
-    df = _load_and_combine_data(input_dir)
-    if df.empty:
-        return df
+    dataset = _open_dataset(base_path, start_date, end_date, schema)
+    if dataset is None:
+        logger.warning(f"No parquet files found in: {base_path}")
+        return
+
+    # One row group at a time: a dataset-wide scanner decodes row groups ahead
+    # of a slower consumer, so its memory grows with the file, not the batch
+    columns = _select_columns(dataset, columns, schema)
+    row_filter = _row_filter(regions, start_date, end_date)
+    scan_options = ds.ParquetFragmentScanOptions(pre_buffer=False)
+    for fragment in dataset.get_fragments():
+        for row_group in fragment.split_by_row_group(row_filter, dataset.schema):
+            for batch in row_group.to_batches(
+                schema=dataset.schema,
+                columns=columns,
+                filter=row_filter,
+                batch_size=batch_size,
+                fragment_scan_options=scan_options,
+            ):
+                if batch.num_rows:
+                    yield enforce_schema(batch.to_pandas(date_as_object=False))
 
-    df = (
+
+def derive_features(df: pd.DataFrame) -> pd.DataFrame:
+    return (
         df.pipe(_clean_pollutant_names)
         .pipe(_add_pollutant_indicators)
         .pipe(_add_derived_features)
     )
 
+
+def to_processed_table(df: pd.DataFrame) -> pa.Table:
+    schema = pa.schema(
+        [field for field in PROCESSED_SCHEMA if field.name in df.columns]
+    )
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+
+def process_aqi_data(
+    input_dir: Path,
+    columns: Optional[Sequence[str]] = None,
+    regions: Optional[Sequence[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> pd.DataFrame:
+    logger.info("Starting data processing")
+
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, *PROCESSING_COLUMNS]))
+    df = _load_and_combine_data(input_dir, columns, regions, start_date, end_date)
+    if df.empty:
+        return df
+
+    df = derive_features(df)
+
     logger.success("Data processing completed")
     return df
@@ -0,0 +1,327 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from loguru import logger
+
+from ..metrics import instrumented
+from .data_processor import AQI_BINS, AQI_LEVELS, DERIVATION_VERSION
+from .processed_layer import ProcessedLayerReport, update_partials, write_parquet
+
+EPISODES_FILE = "episodes.parquet"
+PARTIALS_FILE = "_daily_partials.parquet"
+STATE_FILE = "_episodes_state.json"
+
+SOURCE_COLUMNS = [
+    "region_id",
+    "region_name_en",
+    "jalali_date",
+    "gregorian_date",
+    "aqi",
+]
+
+# Every level from this one up, on the same scale as aqi_level. A day
+# belongs to a band's episode when its mean AQI is above the band's lower
+# bound; the bands nest, so a very unhealthy run is also unhealthy
+FIRST_EPISODE_LEVEL = AQI_LEVELS.index("Unhealthy for Sensitive")
+EPISODE_BANDS = dict(
+    zip(AQI_LEVELS[FIRST_EPISODE_LEVEL:], AQI_BINS[FIRST_EPISODE_LEVEL:-1])
+)
+MIN_EPISODE_DAYS = 2
+
+# A jump is a day at least JUMP_DELTA above the mean of the days before it
+BASELINE_DAYS = 7
+BASELINE_MIN_DAYS = 3
+JUMP_DELTA = 50.0
+
+KINDS = ("exceedance", "jump")
+EPISODE_COLUMNS = [
+    "region_id",
+    "region_name_en",
+    "kind",
+    "band",
+    "start_date",
+    "end_date",
+    "start_jalali_date",
+    "end_jalali_date",
+    "days",
+    "peak_aqi",
+    "mean_aqi",
+    "baseline_aqi",
+]
+
+# Bump when the partial or episode layout, or the rules above, change
+EPISODES_VERSION = f"2.{DERIVATION_VERSION}"
+
+
+@dataclass
+class EpisodesReport:
+    aggregated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    episodes: int = 0
+    redetected_from: Optional[str] = None
+
+
+def _partial_daily(path: Path, source: str) -> pd.DataFrame:
+    df = pq.read_table(path, columns=SOURCE_COLUMNS).to_pandas(date_as_object=False)
+    # Sums rather than means, so snapshots of one day split across files
+    # still average to the same daily value
+    partial = (
+        df.dropna(subset=["aqi"])
+        .groupby(["region_id", "gregorian_date"], sort=False)
+        .agg(
+            region_name_en=("region_name_en", "first"),
+            jalali_date=("jalali_date", "first"),
+            readings=("aqi", "count"),
+            aqi_sum=("aqi", "sum"),
+        )
+        .reset_index()
+    )
+    partial["region_name_en"] = partial["region_name_en"].astype(str)
+    partial["jalali_date"] = partial["jalali_date"].astype(str)
+    partial["source"] = source
+    return partial
+
+
+def daily_series(partials: pd.DataFrame) -> pd.DataFrame:
+    # Sorted by region, then date: every region's days are one contiguous,
+    # chronological block, which is what the run detection below relies on
+    daily = (
+        partials.groupby(["region_id", "gregorian_date"], sort=True)
+        .agg(
+            region_name_en=("region_name_en", "first"),
+            jalali_date=("jalali_date", "first"),
+            readings=("readings", "sum"),
+            aqi_sum=("aqi_sum", "sum"),
+        )
+        .reset_index()
+    )
+    daily["aqi"] = daily["aqi_sum"] / daily["readings"]
+    return daily.drop(columns=["readings", "aqi_sum"])
+
+
+def _runs(
+    region: np.ndarray, day: np.ndarray, flag: np.ndarray, min_days: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # A row continues the previous row's run when both are flagged, belong
+    # to the same region and are one calendar day apart; a missing day or a
+    # region boundary ends the run
+    follows = np.zeros(len(flag), dtype=bool)
+    follows[1:] = (
+        flag[1:] & flag[:-1] & (region[1:] == region[:-1]) & (np.diff(day) == 1)
+    )
+    starts = np.flatnonzero(flag & ~follows)
+    ends = np.flatnonzero(flag & ~np.append(follows[1:], False))
+    keep = ends - starts + 1 >= min_days
+    return starts[keep], ends[keep]
+
+
+def _episode_frame(
+    daily: pd.DataFrame,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    kind: str,
+    band: Optional[str],
+    baseline: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    aqi = daily["aqi"].to_numpy(np.float64)
+    days = ends - starts + 1
+    # Runs are contiguous row ranges, so their statistics are slice
+    # reductions; the padding keeps the last run's end bound in range
+    bounds = np.column_stack([starts, ends + 1]).ravel()
+    peaks = np.maximum.reduceat(np.append(aqi, 0), bounds)[::2] if len(days) else []
+    totals = np.concatenate([[0], np.cumsum(aqi)])
+    dates = daily["gregorian_date"].to_numpy()
+    jalali = daily["jalali_date"].to_numpy()
+    return pd.DataFrame(
+        {
+            "region_id": daily["region_id"].to_numpy()[starts],
+            "region_name_en": daily["region_name_en"].to_numpy()[starts],
+            "kind": kind,
+            "band": band,
+            "start_date": dates[starts],
+            "end_date": dates[ends],
+            "start_jalali_date": jalali[starts],
+            "end_jalali_date": jalali[ends],
+            "days": days,
+            "peak_aqi": peaks,
+            "mean_aqi": (totals[ends + 1] - totals[starts]) / days,
+            # The level the region jumped from, before the jump itself
+            # raises the following days' baselines
+            "baseline_aqi": np.nan if baseline is None else baseline[starts],
+        }
+    )
+
+
+def _finalize(episodes: pd.DataFrame) -> pd.DataFrame:
+    episodes = episodes.astype(
+        {
+            "kind": pd.CategoricalDtype(KINDS),
+            "band": pd.CategoricalDtype(list(EPISODE_BANDS)),
+        }
+    )
+    return episodes.sort_values(
+        ["region_id", "start_date", "kind", "band"], ignore_index=True
+    )[EPISODE_COLUMNS]
+
+
+def detect_episodes(daily: pd.DataFrame) -> pd.DataFrame:
+    region = daily["region_id"].to_numpy()
+    day = daily["gregorian_date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    aqi = daily["aqi"].to_numpy(np.float64)
+
+    frames = []
+    for band, lower_bound in EPISODE_BANDS.items():
+        starts, ends = _runs(region, day, aqi > lower_bound, MIN_EPISODE_DAYS)
+        frames.append(_episode_frame(daily, starts, ends, "exceedance", band))
+
+    # Time-based window over the days before each day, so gaps in the
+    # archive shorten the baseline instead of stretching it
+    baseline = (
+        daily.set_index("gregorian_date")
+        .groupby("region_id", sort=True)["aqi"]
+        .rolling(f"{BASELINE_DAYS}D", closed="left", min_periods=BASELINE_MIN_DAYS)
+        .mean()
+        .to_numpy(np.float64)
+    )
+    with np.errstate(invalid="ignore"):
+        jumps = aqi - baseline >= JUMP_DELTA
+    starts, ends = _runs(region, day, jumps, 1)
+    frames.append(_episode_frame(daily, starts, ends, "jump", None, baseline))
+    return _finalize(pd.concat(frames, ignore_index=True))
+
+
+def _redetect(
+    daily: pd.DataFrame, previous: pd.DataFrame, changed_from: pd.Timestamp
+) -> pd.DataFrame:
+    # An episode ending before the day preceding the first changed day is
+    # final: the day that ended it, and every baseline it was measured
+    # against, lie before the change
+    boundary = changed_from - pd.Timedelta(days=1)
+    kept = previous[previous["end_date"] < boundary]
+    reopened = previous[previous["end_date"] >= boundary]
+
+    # Start early enough to see whole runs crossing the boundary, plus two
+    # baseline windows so the truncated baselines at the very start of the
+    # window cannot touch any of them
+    window_start = boundary - pd.Timedelta(days=MIN_EPISODE_DAYS)
+    if not reopened.empty:
+        window_start = min(window_start, reopened["start_date"].min())
+    window_start -= pd.Timedelta(days=2 * BASELINE_DAYS)
+
+    redetected = detect_episodes(daily[daily["gregorian_date"] >= window_start])
+    redetected = redetected[redetected["end_date"] >= boundary]
+    return _finalize(pd.concat([kept, redetected], ignore_index=True))
+
+
+def _write_episodes(episodes: pd.DataFrame, path: Path) -> None:
+    write_parquet(
+        episodes.astype(
+            {
+                "days": np.int16,
+                "peak_aqi": np.float32,
+                "mean_aqi": np.float32,
+                "baseline_aqi": np.float32,
+            }
+        ),
+        path,
+    )
+
+
+def _read_episodes(path: Path) -> pd.DataFrame:
+    episodes = pq.read_table(path).to_pandas(date_as_object=False)
+    # Back to the in-memory dtypes, so kept and re-detected episodes
+    # concatenate exactly like one full detection
+    return episodes.astype(
+        {
+            "days": np.int64,
+            "peak_aqi": np.float64,
+            "mean_aqi": np.float64,
+            "baseline_aqi": np.float64,
+        }
+    )
+
+
+@instrumented("update_episodes")
+def update_episodes(
+    input_dir: Union[str, Path],
+    processed_dir: Union[str, Path],
+    episodes_dir: Union[str, Path],
+    processed: Optional[ProcessedLayerReport] = None,
+) -> EpisodesReport:
+    episodes_path = Path(episodes_dir).resolve()
+    output_path = episodes_path / EPISODES_FILE
+    update = update_partials(
+        input_dir,
+        processed_dir,
+        episodes_path,
+        _partial_daily,
+        EPISODES_VERSION,
+        PARTIALS_FILE,
+        STATE_FILE,
+        outputs=(EPISODES_FILE,),
+        processed=processed,
+    )
+    report = EpisodesReport(
+        aggregated=update.aggregated,
+        removed=update.removed,
+        unchanged=update.unchanged,
+    )
+    if not update.changed:
+        logger.info(f"Episodes up to date ({report.unchanged} sources)")
+        return report
+
+    # Days whose daily mean may have moved: everything a changed file held
+    # before, and everything it holds now
+    partials = update.partials
+    fresh = partials[partials["source"].isin(update.aggregated)]
+    changed = [
+        frame["gregorian_date"] for frame in (update.replaced, fresh) if len(frame)
+    ]
+
+    if partials.empty:
+        episodes = _finalize(pd.DataFrame(columns=EPISODE_COLUMNS))
+    else:
+        daily = daily_series(partials)
+        if report.unchanged and changed:
+            changed_from = min(dates.min() for dates in changed)
+            report.redetected_from = str(changed_from.date())
+            episodes = _redetect(daily, _read_episodes(output_path), changed_from)
+        else:
+            episodes = detect_episodes(daily)
+    _write_episodes(episodes, output_path)
+    update.save()
+
+    report.episodes = len(episodes)
+    logger.info(
+        f"Episodes: {len(report.aggregated)} aggregated, "
+        f"{len(report.removed)} removed, {report.unchanged} unchanged, "
+        f"{report.episodes:,} episodes"
+        + (
+            f" (re-detected from {report.redetected_from})"
+            if report.redetected_from
+            else ""
+        )
+    )
+    return report
+
+
+def load_episodes(
+    episodes_dir: Union[str, Path],
+    regions: Optional[Sequence[str]] = None,
+    kind: Optional[str] = None,
+) -> pd.DataFrame:
+    if kind is not None and kind not in KINDS:
+        raise ValueError(f"Unknown episode kind {kind!r}, expected one of {KINDS}")
+    filters = []
+    if regions:
+        filters.append(("region_name_en", "in", list(regions)))
+    if kind is not None:
+        filters.append(("kind", "==", kind))
+    return pq.read_table(
+        Path(episodes_dir) / EPISODES_FILE, filters=filters or None
+    ).to_pandas(date_as_object=False)
@@ -0,0 +1,284 @@
+import json
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+from ..metrics import call_collected, increment, merge_collected
+from ..schema import enforce_schema
+from .data_processor import (
+    DEFAULT_BATCH_SIZE,
+    DERIVATION_VERSION,
+    DERIVED_SCHEMA,
+    PROCESSED_SCHEMA,
+    PROCESSING_COLUMNS,
+    _load_and_combine_data,
+    derive_features,
+    to_processed_table,
+)
+from .parallel import create_executor
+
+STATE_FILE = "_processed_state.json"
+
+
+@dataclass
+class ProcessedLayerReport:
+    derived: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    invalidated: bool = False
+
+
+def _is_data_file(path: Path, base_path: Path) -> bool:
+    # Same rule as the dataset scanner: "_" and "." entries are not data
+    return not any(
+        part.startswith(("_", ".")) for part in path.relative_to(base_path).parts
+    )
+
+
+def _fingerprint(path: Path) -> Dict[str, int]:
+    stat = path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def load_state(state_path: Path) -> Dict:
+    if not state_path.exists():
+        return {"version": None, "sources": {}}
+    try:
+        return json.loads(state_path.read_text(encoding="utf-8"))
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable processed state: {e}")
+        return {"version": None, "sources": {}}
+
+
+def save_state(state_path: Path, state: Dict) -> None:
+    tmp_path = state_path.with_name(f".{state_path.name}.tmp")
+    tmp_path.write_text(json.dumps(state, indent=1), encoding="utf-8")
+    tmp_path.replace(state_path)
+
+
+def _derive_file(source: Path, target: Path, batch_size: int) -> int:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    rows = 0
+    # Batch at a time, so a compacted yearly file never has to fit in memory
+    with pq.ParquetWriter(tmp_path, PROCESSED_SCHEMA, compression="snappy") as writer:
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_size):
+            df = enforce_schema(batch.to_pandas(date_as_object=False), complete=True)
+            writer.write_table(to_processed_table(derive_features(df)))
+            rows += len(df)
+    tmp_path.replace(target)
+    return rows
+
+
+def update_processed_layer(
+    input_dir: Union[str, Path],
+    processed_dir: Union[str, Path],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+) -> ProcessedLayerReport:
+    base_path = Path(input_dir).resolve()
+    processed_path = Path(processed_dir).resolve()
+    processed_path.mkdir(parents=True, exist_ok=True)
+    state_path = processed_path / STATE_FILE
+
+    state = load_state(state_path)
+    report = ProcessedLayerReport()
+    if state["version"] != DERIVATION_VERSION:
+        if state["sources"]:
+            logger.info(
+                f"Derivation version changed ({state['version']} -> "
+                f"{DERIVATION_VERSION}); rebuilding processed layer"
+            )
+        for entry in state["sources"].values():
+            (processed_path / entry["output"]).unlink(missing_ok=True)
+        state = {"version": DERIVATION_VERSION, "sources": {}}
+        report.invalidated = True
+
+    current = {
+        str(path.relative_to(base_path)): path
+        for path in base_path.rglob("*.parquet")
+        if _is_data_file(path, base_path) and processed_path not in path.parents
+    }
+
+    for rel_path in set(state["sources"]) - set(current):
+        output = processed_path / state["sources"].pop(rel_path)["output"]
+        output.unlink(missing_ok=True)
+        report.removed.append(rel_path)
+
+    pending = []
+    for rel_path, path in sorted(current.items()):
+        fingerprint = _fingerprint(path)
+        entry = state["sources"].get(rel_path)
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            report.unchanged += 1
+            continue
+        pending.append((rel_path, path, fingerprint))
+
+    # Files are derived independently, so they spread over a pool as-is
+    executor = create_executor(workers) if workers > 1 and len(pending) > 1 else None
+    derive = executor.map if executor is not None else map
+    try:
+        results = derive(
+            partial(call_collected, _derive_file),
+            [path for _, path, _ in pending],
+            [processed_path / rel_path for rel_path, _, _ in pending],
+            [batch_size] * len(pending),
+        )
+        for (rel_path, _, fingerprint), collected in zip(pending, results):
+            rows = merge_collected(collected)
+            state["sources"][rel_path] = {
+                "fingerprint": fingerprint,
+                "output": rel_path,
+                "rows": rows,
+            }
+            report.derived.append(rel_path)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        # Progress survives a failure part-way through the archive
+        save_state(state_path, state)
+
+    increment("processed_layer_hits", report.unchanged)
+    increment("processed_layer_misses", len(report.derived))
+    logger.info(
+        f"Processed layer: {len(report.derived)} derived, "
+        f"{len(report.removed)} removed, {report.unchanged} unchanged"
+    )
+    return report
+
+
+def load_processed_aqi_data(
+    input_dir: Path,
+    processed_dir: Path,
+    columns: Optional[Sequence[str]] = None,
+    regions: Optional[Sequence[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+    processed: Optional[ProcessedLayerReport] = None,
+) -> pd.DataFrame:
+    logger.info("Starting data processing (processed layer)")
+    if processed is None:
+        update_processed_layer(input_dir, processed_dir, batch_size, workers)
+
+    if columns is not None:
+        columns = list(
+            dict.fromkeys([*columns, *PROCESSING_COLUMNS, *DERIVED_SCHEMA.names])
+        )
+    df = _load_and_combine_data(
+        processed_dir, columns, regions, start_date, end_date, PROCESSED_SCHEMA
+    )
+    logger.success("Data processing completed")
+    return df
+
+
+@dataclass
+class PartialsUpdate:
+    # Partial aggregates of every processed file, one set of rows per file
+    # tagged with its "source"; `replaced` holds the rows the changed and
+    # removed files had before this update
+    partials: pd.DataFrame
+    replaced: pd.DataFrame
+    aggregated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    partials_path: Optional[Path] = None
+    state_path: Optional[Path] = None
+    state: Dict = field(default_factory=dict)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.aggregated or self.removed)
+
+    def save(self) -> None:
+        # Called once the outputs built from these partials are written, so
+        # a failure in between leaves the files marked as not yet aggregated
+        write_parquet(self.partials, self.partials_path)
+        save_state(self.state_path, self.state)
+
+
+def write_parquet(df: pd.DataFrame, path: Path) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, tmp_path, compression="zstd")
+    tmp_path.replace(path)
+
+
+def source_fingerprints(processed_dir: Union[str, Path]) -> Dict[str, Dict[str, int]]:
+    processed_path = Path(processed_dir).resolve()
+    return {
+        str(path.relative_to(processed_path)): _fingerprint(path)
+        for path in sorted(processed_path.rglob("*.parquet"))
+        if _is_data_file(path, processed_path)
+    }
+
+
+def update_partials(
+    input_dir: Union[str, Path],
+    processed_dir: Union[str, Path],
+    output_dir: Union[str, Path],
+    aggregate: Callable[[Path, str], pd.DataFrame],
+    version: str,
+    partials_file: str,
+    state_file: str,
+    outputs: Sequence[str] = (),
+    processed: Optional[ProcessedLayerReport] = None,
+) -> PartialsUpdate:
+    # Callers that already brought the processed layer up to date pass its
+    # report instead of having the archive scanned again
+    if processed is None:
+        update_processed_layer(input_dir, processed_dir)
+    processed_path = Path(processed_dir).resolve()
+    output_path = Path(output_dir).resolve()
+    output_path.mkdir(parents=True, exist_ok=True)
+    partials_path = output_path / partials_file
+    state_path = output_path / state_file
+
+    state = load_state(state_path)
+    complete = partials_path.exists() and all(
+        (output_path / name).exists() for name in outputs
+    )
+    if state["version"] != version or not complete:
+        state = {"version": version, "sources": {}}
+        partials = pd.DataFrame()
+    else:
+        partials = pq.read_table(partials_path).to_pandas(date_as_object=False)
+
+    current = source_fingerprints(processed_path)
+    update = PartialsUpdate(
+        partials=partials,
+        replaced=partials.iloc[:0],
+        removed=sorted(set(state["sources"]) - set(current)),
+        partials_path=partials_path,
+        state_path=state_path,
+        state=state,
+    )
+    fresh = []
+    for rel_path, fingerprint in current.items():
+        entry = state["sources"].get(rel_path)
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            update.unchanged += 1
+            continue
+        fresh.append(aggregate(processed_path / rel_path, rel_path))
+        state["sources"][rel_path] = {"fingerprint": fingerprint}
+        update.aggregated.append(rel_path)
+    for rel_path in update.removed:
+        del state["sources"][rel_path]
+    if not update.changed:
+        return update
+
+    # Only the partials of changed files are replaced; the rest are reused
+    stale = set(update.aggregated) | set(update.removed)
+    if not partials.empty:
+        is_stale = partials["source"].isin(stale)
+        update.replaced = partials[is_stale]
+        partials = partials[~is_stale]
+    update.partials = pd.concat([partials, *fresh], ignore_index=True)
+    return update
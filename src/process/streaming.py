@@ -0,0 +1,95 @@
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow.parquet as pq
+from loguru import logger
+
+from .data_processor import (
+    DEFAULT_BATCH_SIZE,
+    PROCESSING_COLUMNS,
+    derive_features,
+    iter_aqi_batches,
+    to_processed_table,
+)
+
+
+class GroupedAggregator:
+    def __init__(self, by: Sequence[str], column: str = "aqi", merge_every: int = 16):
+        self.by = list(by)
+        self.column = column
+        self.merge_every = merge_every
+        self._partials: List[pd.DataFrame] = []
+
+    def update(self, df: pd.DataFrame) -> None:
+        partial = df.groupby(self.by, observed=True)[self.column].agg(
+            ["count", "sum", "max"]
+        )
+        self._partials.append(partial)
+        if len(self._partials) >= self.merge_every:
+            self._merge()
+
+    def _merge(self) -> None:
+        if len(self._partials) < 2:
+            return
+        # Memory stays proportional to the number of groups, not rows seen
+        combined = pd.concat(self._partials)
+        merged = combined.groupby(level=self.by, observed=True).agg(
+            {"count": "sum", "sum": "sum", "max": "max"}
+        )
+        self._partials = [merged]
+
+    def result(self) -> pd.DataFrame:
+        self._merge()
+        if not self._partials:
+            return pd.DataFrame(columns=["count", "sum", "max", "mean"])
+        result = self._partials[0].copy()
+        result["mean"] = result["sum"] / result["count"]
+        return result
+
+
+def process_aqi_data_streaming(
+    input_dir: Union[str, Path],
+    output_path: Optional[Union[str, Path]] = None,
+    columns: Optional[Sequence[str]] = None,
+    regions: Optional[Sequence[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    aggregators: Sequence[GroupedAggregator] = (),
+) -> int:
+    logger.info(f"Starting streaming data processing (batch size {batch_size:,})")
+
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, *PROCESSING_COLUMNS]))
+    batches = iter_aqi_batches(
+        input_dir, columns, regions, start_date, end_date, batch_size
+    )
+
+    writer = None
+    rows = 0
+    if output_path is not None:
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+    try:
+        for df in batches:
+            df = derive_features(df)
+            for aggregator in aggregators:
+                aggregator.update(df)
+            if output_path is not None:
+                table = to_processed_table(df)
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        tmp_path, table.schema, compression="snappy"
+                    )
+                writer.write_table(table)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        tmp_path.replace(output_path)
+    logger.success(f"Streaming processing completed: {rows:,} records")
+    return rows
@@ -0,0 +1,201 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from loguru import logger
+
+from ..schema import MONTH_STARTS, decode_jalali_dates
+from .data_processor import DERIVATION_VERSION
+from .processed_layer import ProcessedLayerReport, update_partials, write_parquet
+
+CUBE_FILE = "summary_cube.parquet"
+DAYS_FILE = "summary_days.parquet"
+PARTIALS_FILE = "_partials.parquet"
+STATE_FILE = "_cube_state.json"
+
+DIMENSIONS = [
+    "region_id",
+    "region_name_en",
+    "state_name_en",
+    "year",
+    "month",
+    "main_pollutant",
+    "aqi_level",
+]
+SOURCE_COLUMNS = [
+    "region_id",
+    "region_name_en",
+    "state_name_en",
+    "jalali_date",
+    "main_pollutant",
+    "aqi_level",
+    "aqi",
+]
+MEASURES = ("readings", "days", "mean_aqi", "max_aqi")
+# What makes a day distinct when counting days
+DAY_KEY = ["region_id", "year", "month", "day"]
+
+# Bump when the partial or cube layout changes so they are rebuilt
+CUBE_VERSION = f"2.{DERIVATION_VERSION}"
+
+
+@dataclass
+class SummaryCubeReport:
+    aggregated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    cells: int = 0
+
+
+def _partial_aggregate(path: Path, source: str) -> pd.DataFrame:
+    df = pq.read_table(path, columns=SOURCE_COLUMNS).to_pandas()
+    years, day_of_year = decode_jalali_dates(df["jalali_date"])
+    months = np.searchsorted(MONTH_STARTS, day_of_year, side="right")
+    df["year"] = years
+    df["month"] = months.astype(np.int8)
+    df["day"] = (day_of_year - MONTH_STARTS[months - 1] + 1).astype(np.int8)
+
+    # Kept at day grain so distinct days can still be counted when
+    # snapshots of the same day live in different files
+    partial = (
+        df.groupby([*DIMENSIONS, "day"], observed=True)["aqi"]
+        .agg(readings="count", aqi_sum="sum", aqi_max="max")
+        .reset_index()
+    )
+    partial["source"] = source
+    return partial
+
+
+def _materialize(partials: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    daily = (
+        partials.groupby([*DIMENSIONS, "day"], observed=True)
+        .agg(
+            readings=("readings", "sum"),
+            aqi_sum=("aqi_sum", "sum"),
+            aqi_max=("aqi_max", "max"),
+        )
+        .reset_index()
+    )
+    cube = (
+        daily.groupby(DIMENSIONS, observed=True)
+        .agg(
+            readings=("readings", "sum"),
+            aqi_sum=("aqi_sum", "sum"),
+            aqi_max=("aqi_max", "max"),
+        )
+        .reset_index()
+        .astype({"readings": np.int32, "aqi_sum": np.float64, "aqi_max": np.float32})
+    )
+    # Snapshots of one region-day can differ in main pollutant and AQI
+    # level, so a day spans several cells and distinct days do not add up
+    # across them; days are counted from this day-grain table instead
+    days = daily[[*DIMENSIONS, "day"]].astype({"day": np.int8})
+    return cube, days
+
+
+def update_summary_cube(
+    input_dir: Union[str, Path],
+    processed_dir: Union[str, Path],
+    cube_dir: Union[str, Path],
+    processed: Optional[ProcessedLayerReport] = None,
+) -> SummaryCubeReport:
+    cube_path = Path(cube_dir).resolve()
+    update = update_partials(
+        input_dir,
+        processed_dir,
+        cube_path,
+        _partial_aggregate,
+        CUBE_VERSION,
+        PARTIALS_FILE,
+        STATE_FILE,
+        outputs=(CUBE_FILE, DAYS_FILE),
+        processed=processed,
+    )
+    report = SummaryCubeReport(
+        aggregated=update.aggregated,
+        removed=update.removed,
+        unchanged=update.unchanged,
+    )
+    if not update.changed:
+        logger.info(f"Summary cube up to date ({report.unchanged} sources)")
+        return report
+
+    cube, days = _materialize(update.partials)
+    write_parquet(cube, cube_path / CUBE_FILE)
+    write_parquet(days, cube_path / DAYS_FILE)
+    update.save()
+
+    report.cells = len(cube)
+    logger.info(
+        f"Summary cube: {len(report.aggregated)} aggregated, "
+        f"{len(report.removed)} removed, {report.unchanged} unchanged, "
+        f"{report.cells:,} cells"
+    )
+    return report
+
+
+class SummaryCube:
+    def __init__(self, cube: pd.DataFrame, days: pd.DataFrame):
+        self.cube = cube
+        self.days = days
+
+    @classmethod
+    def load(cls, cube_dir: Union[str, Path]) -> "SummaryCube":
+        return cls(
+            pq.read_table(Path(cube_dir) / CUBE_FILE).to_pandas(),
+            pq.read_table(Path(cube_dir) / DAYS_FILE).to_pandas(),
+        )
+
+    def latest_month(self) -> Tuple[int, int]:
+        year = int(self.cube["year"].max())
+        month = int(self.cube.loc[self.cube["year"] == year, "month"].max())
+        return year, month
+
+    @staticmethod
+    def _select(table: pd.DataFrame, filters: Dict[str, object]) -> pd.DataFrame:
+        mask = np.ones(len(table), dtype=bool)
+        for dim, value in filters.items():
+            if value is None:
+                continue
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension {dim!r}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= table[dim].isin(values).to_numpy()
+        return table[mask]
+
+    def rollup(
+        self,
+        by: Sequence[str],
+        measures: Sequence[str] = MEASURES,
+        **filters,
+    ) -> pd.DataFrame:
+        unknown = [m for m in measures if m not in MEASURES]
+        if unknown:
+            raise ValueError(f"Unknown measures {unknown}, expected {MEASURES}")
+
+        selected = self._select(self.cube, filters)
+        grouped = selected.groupby(list(by), observed=True).agg(
+            readings=("readings", "sum"),
+            aqi_sum=("aqi_sum", "sum"),
+            max_aqi=("aqi_max", "max"),
+        )
+        grouped["mean_aqi"] = grouped["aqi_sum"] / grouped["readings"]
+        if "days" in measures:
+            days = self._select(self.days, filters).drop_duplicates([*by, *DAY_KEY])
+            grouped["days"] = days.groupby(list(by), observed=True).size()
+        return grouped[list(measures)]
+
+    def top_regions(
+        self,
+        n: int = 10,
+        year: Optional[int] = None,
+        month: Optional[int] = None,
+        measure: str = "mean_aqi",
+    ) -> pd.DataFrame:
+        if year is None and month is None:
+            year, month = self.latest_month()
+        result = self.rollup(["region_name_en"], year=year, month=month)
+        return result.nlargest(n, measure)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Final, Tuple
+
+import jdatetime
+import numpy as np
+import pyarrow as pa
+from loguru import logger
+
+from .constants import AQIColumns
+
+# pandas is imported inside the functions that need it, so fetching (which
+# only needs the Arrow schema) does not pay for it at startup
+if TYPE_CHECKING:
+    import pandas as pd
+
+TIMESTAMP_TYPE: Final = pa.timestamp("us", tz="UTC")
+NAME_TYPE: Final = pa.dictionary(pa.int32(), pa.string())
+ORDERED_NAME_TYPE: Final = pa.dictionary(pa.int32(), pa.string(), ordered=True)
+
+COLUMN_TYPES: Final[Dict[str, pa.DataType]] = {
+    "id": pa.int64(),
+    "state_id": pa.int16(),
+    "region_id": pa.int32(),
+    "co": pa.float32(),
+    "o3": pa.float32(),
+    "no2": pa.float32(),
+    "so2": pa.float32(),
+    "pm10": pa.float32(),
+    "pm2_5": pa.float32(),
+    "aqi": pa.float32(),
+    "main_pollutant": NAME_TYPE,
+    "state_name_fa": NAME_TYPE,
+    "state_name_en": NAME_TYPE,
+    "region_name_fa": NAME_TYPE,
+    "region_name_en": NAME_TYPE,
+    "region_latitude": pa.float32(),
+    "region_longitude": pa.float32(),
+    "create_date": TIMESTAMP_TYPE,
+    "modify_date": TIMESTAMP_TYPE,
+    "date": TIMESTAMP_TYPE,
+    "jalali_date": ORDERED_NAME_TYPE,
+    "snapshot_time": ORDERED_NAME_TYPE,
+    "region_type": pa.int8(),
+    "gregorian_date": pa.date32(),
+}
+
+AQI_SCHEMA: Final = pa.schema(
+    [(name, COLUMN_TYPES[name]) for name in AQIColumns.MAPPING.values()]
+    + [("gregorian_date", COLUMN_TYPES["gregorian_date"])]
+)
+
+# Zero-padded text that sorts chronologically, so min/max/sort keep working
+ORDERED_COLUMNS: Final = ("jalali_date", "snapshot_time")
+
+# Values implied by files written before snapshots were configurable
+LEGACY_DEFAULTS: Final[Dict[str, object]] = {"snapshot_time": "11:00", "region_type": 1}
+
+# Esfand (month 12) gets a 30th slot that only leap years fill, so every
+# Jalali date maps to the same position regardless of the year
+MONTH_LENGTHS: Final = np.array([31] * 6 + [30] * 6)
+MONTH_STARTS: Final = np.concatenate([[0], np.cumsum(MONTH_LENGTHS)[:-1]])
+DAYS_IN_YEAR: Final = int(MONTH_LENGTHS.sum())
+
+
+def _pandas_dtype(arrow_type: pa.DataType):
+    if pa.types.is_dictionary(arrow_type):
+        return "category"
+    if pa.types.is_timestamp(arrow_type):
+        return f"datetime64[{arrow_type.unit}, {arrow_type.tz}]"
+    if pa.types.is_date(arrow_type):
+        return "datetime64[ms]"
+    return arrow_type.to_pandas_dtype()
+
+
+def jalali_to_gregorian(jalali_dates: pd.Series) -> pd.Series:
+    import pandas as pd
+
+    # Converted once per distinct date; archives have far fewer dates than rows
+    categories = jalali_dates.astype("category")
+    gregorian = {
+        value: jdatetime.date(*map(int, value.split("/"))).togregorian()
+        for value in categories.cat.categories
+    }
+    return pd.to_datetime(categories.map(gregorian).astype(object)).astype(
+        "datetime64[ms]"
+    )
+
+
+def decode_jalali_dates(dates: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    # Parsed once per distinct date; rows only carry the integer codes
+    categories = dates.astype("category")
+    text = categories.cat.categories.astype(str)
+    years = text.str[:4].astype(np.int16).to_numpy()
+    months = text.str[5:7].astype(np.int8).to_numpy()
+    days = text.str[8:10].astype(np.int16).to_numpy()
+    day_of_year = (MONTH_STARTS[months - 1] + days - 1).astype(np.int16)
+
+    codes = categories.cat.codes.to_numpy()
+    return years[codes], day_of_year[codes]
+
+
+def enforce_schema(df: pd.DataFrame, complete: bool = False) -> pd.DataFrame:
+    import pandas as pd
+
+    if complete:
+        for col in AQI_SCHEMA.names:
+            if col not in df.columns:
+                df[col] = None
+
+    for col, default in LEGACY_DEFAULTS.items():
+        if col in df.columns:
+            df[col] = df[col].fillna(default)
+
+    if (
+        "gregorian_date" in df.columns
+        and "jalali_date" in df.columns
+        and df["gregorian_date"].isna().any()
+    ):
+        df["gregorian_date"] = jalali_to_gregorian(df["jalali_date"])
+
+    # Integer columns cannot hold nulls, and a row without its ids cannot be
+    # placed; such rows are dropped instead of failing the whole load
+    missing_ids = [
+        col
+        for col in df.columns
+        if col in COLUMN_TYPES
+        and pa.types.is_integer(COLUMN_TYPES[col])
+        and df[col].isna().any()
+    ]
+    if missing_ids:
+        missing = df[missing_ids].isna().any(axis=1)
+        logger.warning(
+            f"Dropping {int(missing.sum()):,} rows with missing "
+            f"{', '.join(missing_ids)}"
+        )
+        df = df[~missing].copy()
+
+    for col in df.columns:
+        if col not in COLUMN_TYPES:
+            continue
+        arrow_type = COLUMN_TYPES[col]
+        dtype = _pandas_dtype(arrow_type)
+        if str(df[col].dtype) == str(dtype):
+            continue
+        if pa.types.is_timestamp(arrow_type):
+            # Files written before timestamps were native hold ISO strings
+            df[col] = pd.to_datetime(df[col], utc=True, format="ISO8601")
+        df[col] = df[col].astype(dtype)
+
+    # Categories are kept sorted so a frame's dtypes do not depend on the
+    # order its files were read in; partitions loaded apart concatenate to
+    # the same frame as one load of the whole archive
+    for col, arrow_type in COLUMN_TYPES.items():
+        if col not in df.columns or not pa.types.is_dictionary(arrow_type):
+            continue
+        ordered = col in ORDERED_COLUMNS
+        categories = df[col].cat.categories
+        if df[col].cat.ordered == ordered and categories.is_monotonic_increasing:
+            continue
+        df[col] = df[col].cat.reorder_categories(sorted(categories), ordered=ordered)
+    return df
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    df = enforce_schema(df)
+    schema = pa.schema([field for field in AQI_SCHEMA if field.name in df.columns])
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
@@ -0,0 +1,152 @@
+import math
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import matplotlib.pyplot as plt
+import pandas as pd
+from loguru import logger
+from matplotlib.backends.backend_pdf import PdfPages
+
+from ..config import AppConfig
+from .pivot import DAY_LABELS, month_boundaries, pivot_day_of_year
+from .utils import fa, fa_num
+from .yearly_report import AQIYearlyTrendVisualizer
+
+
+def pivot_regions_trend_data(
+    df: pd.DataFrame,
+    regions: Sequence[str],
+    date_col: str = "jalali_date",
+    aqi_col: str = "aqi",
+    aggfunc: str = "mean",
+) -> Dict[str, pd.DataFrame]:
+    df = df[df["region_name_en"].isin(regions)]
+    # One pivot for every region instead of one pivot per region
+    wide = pivot_day_of_year(df, date_col, aqi_col, aggfunc, by="region_name_en")
+    return {
+        region: region_df.droplevel("region_name_en").dropna(axis=1, how="all")
+        for region, region_df in wide.groupby(level="region_name_en")
+    }
+
+
+class AQINationalOverviewVisualizer(AQIYearlyTrendVisualizer):
+    def __init__(self, config: AppConfig, dpi: int = 200, ncols: int = 4):
+        super().__init__(config, dpi)
+        self.ncols = ncols
+
+    def configure_panel_ticks(self, ax: plt.Axes, pivot_df: pd.DataFrame) -> None:
+        tick_positions = month_boundaries(pivot_df.index)
+        ax.set_xticks(tick_positions)
+        ax.set_xticklabels(
+            [fa_num(label[:2]) for label in DAY_LABELS[tick_positions]],
+            fontsize=7,
+            fontproperties=self.config.FONT_REGULAR_PATH,
+        )
+        for x in tick_positions:
+            ax.axvline(x=x, color="lightgray", linestyle="--", linewidth=0.4, zorder=0)
+        ax.margins(x=0)
+        ax.grid(False)
+
+    def create_overview_figure(
+        self, pivots: Dict[str, pd.DataFrame], region_names: Dict[str, str]
+    ) -> plt.Figure:
+        regions = list(pivots)
+        nrows = math.ceil(len(regions) / self.ncols)
+        fig = plt.figure(figsize=(4.5 * self.ncols + 1.5, 3 * nrows + 1))
+        grid = fig.add_gridspec(nrows, self.ncols * 8 + 1)
+
+        first_ax = None
+        for i, region in enumerate(regions):
+            row, col = divmod(i, self.ncols)
+            ax = fig.add_subplot(grid[row, col * 8 : (col + 1) * 8], sharey=first_ax)
+            first_ax = first_ax or ax
+
+            self.draw_aqi_background_ranges(ax)
+            self.plot_yearly_trend_lines(ax, pivots[region])
+            self.configure_panel_ticks(ax, pivots[region])
+            ax.set_title(
+                fa(region_names.get(region, region)),
+                fontsize=11,
+                fontproperties=self.config.FONT_BOLD_PATH,
+            )
+            if col:
+                ax.tick_params(labelleft=False)
+
+        first_ax.set_ylim(bottom=0)
+        yticks = first_ax.get_yticks().tolist()
+        first_ax.set_yticks(yticks)
+        first_ax.set_yticklabels(
+            [fa_num(f"{tick:.0f}") for tick in yticks],
+            fontsize=7,
+            fontproperties=self.config.FONT_REGULAR_PATH,
+        )
+
+        # One range legend for the whole grid rather than one per chart
+        ax_bar = fig.add_subplot(grid[:, -1], sharey=first_ax)
+        self.create_aqi_range_legend(ax_bar)
+        fig.suptitle(
+            fa("مقایسه شاخص آلودگی هوا (AQI) استان‌ها"),
+            fontsize=20,
+            fontproperties=self.config.FONT_BOLD_PATH,
+        )
+        fig.subplots_adjust(
+            left=0.03, right=0.97, top=0.93, bottom=0.04, hspace=0.45, wspace=0.6
+        )
+        return fig
+
+    def generate_overview_report(
+        self,
+        df: pd.DataFrame,
+        regions: Sequence[str],
+        output_format: str = "png",
+        regions_per_page: int = 16,
+    ) -> List[Path]:
+        pivots = pivot_regions_trend_data(
+            df, regions, aggfunc=self.config.TREND_AGGREGATION
+        )
+        missing = [region for region in regions if region not in pivots]
+        if missing:
+            logger.warning(f"No data found for regions: {', '.join(missing)}")
+        if not pivots:
+            return []
+
+        region_names = (
+            df.drop_duplicates("region_name_en")
+            .set_index("region_name_en")["region_name_fa"]
+            .astype(str)
+            .to_dict()
+        )
+        ordered = [region for region in regions if region in pivots]
+        self.config.PLOTS_DIR.mkdir(parents=True, exist_ok=True)
+
+        if output_format == "pdf":
+            output_path = self.config.PLOTS_DIR / "aqi_national_overview.pdf"
+            with PdfPages(output_path) as pdf:
+                for start in range(0, len(ordered), regions_per_page):
+                    page = ordered[start : start + regions_per_page]
+                    fig = self.create_overview_figure(
+                        {region: pivots[region] for region in page}, region_names
+                    )
+                    pdf.savefig(fig, dpi=self.dpi)
+                    plt.close(fig)
+        else:
+            output_path = self.config.PLOTS_DIR / "aqi_national_overview.png"
+            fig = self.create_overview_figure(
+                {region: pivots[region] for region in ordered}, region_names
+            )
+            fig.savefig(output_path, dpi=self.dpi)
+            plt.close(fig)
+
+        logger.success(f"Overview saved successfully: {output_path}")
+        return [output_path]
+
+
+def create_aqi_national_overview(
+    df: pd.DataFrame,
+    regions: Sequence[str],
+    config: AppConfig,
+    output_format: str = "png",
+    dpi: int = 200,
+) -> List[Path]:
+    visualizer = AQINationalOverviewVisualizer(config, dpi)
+    return visualizer.generate_overview_report(df, regions, output_format)
@@ -0,0 +1,73 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+from loguru import logger
+
+from ..config import AppConfig
+from ..metrics import call_collected, merge_collected, merge_failed
+from .yearly_report import AQIYearlyTrendVisualizer
+
+_visualizer: Optional[AQIYearlyTrendVisualizer] = None
+
+
+def _init_worker(config: AppConfig, dpi: int) -> None:
+    global _visualizer
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend("Agg")
+    # Fonts and rcParams are set up once per worker, not once per region
+    _visualizer = AQIYearlyTrendVisualizer(config, dpi)
+
+
+def _render_region(region: str, region_df: pd.DataFrame) -> str:
+    _visualizer.generate_yearly_trend_report(region_df, region)
+    return region
+
+
+def render_regions_parallel(
+    df: pd.DataFrame,
+    regions: Sequence[str],
+    config: AppConfig,
+    dpi: int = 400,
+    workers: Optional[int] = None,
+) -> Dict[str, Optional[str]]:
+    slices = {
+        region: region_df
+        for region, region_df in df[df["region_name_en"].isin(regions)].groupby(
+            "region_name_en", observed=True
+        )
+    }
+    errors: Dict[str, Optional[str]] = {}
+    for region in regions:
+        if region not in slices:
+            logger.warning(f"No data found for region: {region}")
+            errors[region] = "no data"
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(config, dpi),
+    ) as executor:
+        futures = {
+            executor.submit(call_collected, _render_region, region, region_df): region
+            for region, region_df in slices.items()
+        }
+        for future in as_completed(futures):
+            region = futures[future]
+            try:
+                merge_collected(future.result())
+                errors[region] = None
+            except Exception as e:
+                merge_failed(e)
+                logger.error(f"Rendering failed for {region}: {e}")
+                errors[region] = str(e)
+
+    failed = [region for region, error in errors.items() if error]
+    logger.info(
+        f"Rendered {len(errors) - len(failed)} of {len(regions)} regions"
+        + (f"; failed: {', '.join(failed)}" if failed else "")
+    )
+    return errors
@@ -0,0 +1,52 @@
+from typing import Final, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..schema import MONTH_LENGTHS, MONTH_STARTS, decode_jalali_dates
+
+AGGREGATIONS: Final = ("mean", "max", "last")
+
+DAY_LABELS: Final = np.array(
+    [
+        f"{month:02d}/{day:02d}"
+        for month, length in enumerate(MONTH_LENGTHS, start=1)
+        for day in range(1, length + 1)
+    ]
+)
+
+
+def month_boundaries(day_of_year: pd.Index) -> np.ndarray:
+    if day_of_year.empty:
+        return MONTH_STARTS[:0]
+    return MONTH_STARTS[
+        (MONTH_STARTS >= day_of_year.min()) & (MONTH_STARTS <= day_of_year.max())
+    ]
+
+
+def pivot_day_of_year(
+    df: pd.DataFrame,
+    date_col: str = "jalali_date",
+    value_col: str = "aqi",
+    aggfunc: str = "mean",
+    by: Optional[str] = None,
+) -> pd.DataFrame:
+    if aggfunc not in AGGREGATIONS:
+        raise ValueError(
+            f"Unknown aggregation {aggfunc!r}, expected one of {AGGREGATIONS}"
+        )
+
+    df = df[df[date_col].notna()]
+    if aggfunc == "last" and "snapshot_time" in df.columns:
+        # "last" means the latest snapshot of the day, not the latest file read
+        df = df.sort_values("snapshot_time", kind="stable")
+
+    years, day_of_year = decode_jalali_dates(df[date_col])
+    keys = [pd.Series(day_of_year, name="day_of_year")]
+    if by is not None:
+        keys.insert(0, pd.Series(df[by].to_numpy(), name=by))
+    keys.append(pd.Series(years, name="year"))
+
+    values = pd.Series(df[value_col].to_numpy())
+    pivot_df = values.groupby(keys, observed=True, sort=True).agg(aggfunc)
+    return pivot_df.unstack("year")
@@ -0,0 +1,71 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from ..metrics import increment
+
+
+@lru_cache(maxsize=None)
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def render_key(
+    data: pd.DataFrame,
+    dpi: int,
+    font_paths: Iterable[Path],
+    version: str,
+    extra: Iterable[object] = (),
+) -> str:
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    digest.update(json.dumps([str(c) for c in data.columns]).encode())
+    digest.update(json.dumps([dpi, version, *map(str, extra)]).encode())
+    for path in font_paths:
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, plots_dir: Path):
+        # Kept beside the plots directory so publishing PLOTS_DIR stays clean
+        self.cache_dir = plots_dir.with_name(f"{plots_dir.name}_render_cache")
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, name: str) -> Path:
+        return self.cache_dir / f"{name}.json"
+
+    def lookup(self, name: str, key: str, output_path: Path) -> bool:
+        entry = self._read(name)
+        hit = (
+            entry is not None
+            and entry.get("key") == key
+            and output_path.exists()
+            and output_path.stat().st_mtime_ns == entry.get("output_mtime_ns")
+        )
+        if hit:
+            self.hits += 1
+            increment("render_cache_hits")
+        else:
+            self.misses += 1
+            increment("render_cache_misses")
+        return hit
+
+    def store(self, name: str, key: str, output_path: Path) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "output_mtime_ns": output_path.stat().st_mtime_ns}
+        self._entry_path(name).write_text(json.dumps(entry), encoding="utf-8")
+
+    def _read(self, name: str) -> Optional[dict]:
+        path = self._entry_path(name)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            return None
@@ -1,4 +1,7 @@
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from time import perf_counter
 from typing import Tuple, Union
 
 from arabic_reshaper import reshape
@@ -6,13 +9,67 @@ from bidi.algorithm import get_display
 from matplotlib.font_manager import FontProperties
 from persiantools import digits
 
+SHAPING_CACHE_SIZE = 4096
+
+
+@dataclass
+class ShapingStats:
+    hits: int = 0
+    misses: int = 0
+    miss_seconds: float = 0.0
+
+    @property
+    def average_miss_seconds(self) -> float:
+        return self.miss_seconds / self.misses if self.misses else 0.0
+
+    @property
+    def saved_seconds(self) -> float:
+        return self.hits * self.average_miss_seconds
+
+    def since(self, earlier: "ShapingStats") -> "ShapingStats":
+        return ShapingStats(
+            self.hits - earlier.hits,
+            self.misses - earlier.misses,
+            self.miss_seconds - earlier.miss_seconds,
+        )
+
+
+_miss_seconds = 0.0
+
+
+@lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def _shape(text: str) -> str:
+    global _miss_seconds
+    started = perf_counter()
+    shaped = get_display(reshape(text))
+    _miss_seconds += perf_counter() - started
+    return shaped
+
+
+@lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def _fa_digits(text: str) -> str:
+    global _miss_seconds
+    started = perf_counter()
+    converted = digits.en_to_fa(text)
+    _miss_seconds += perf_counter() - started
+    return converted
+
 
 def fa(text: str) -> str:
-    return get_display(reshape(text))
+    return _shape(text)
 
 
 def fa_num(text: Union[int, str]) -> str:
-    return digits.en_to_fa(str(text))
+    return _fa_digits(str(text))
+
+
+def shaping_stats() -> ShapingStats:
+    shape_info, digits_info = _shape.cache_info(), _fa_digits.cache_info()
+    return ShapingStats(
+        hits=shape_info.hits + digits_info.hits,
+        misses=shape_info.misses + digits_info.misses,
+        miss_seconds=_miss_seconds,
+    )
 
 
 def load_fonts(
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -5,8 +7,16 @@ from loguru import logger
 from matplotlib.ticker import FixedLocator
 
 from ..config import AppConfig
-from ..constants import AQIRanges
-from .utils import fa, fa_num, load_fonts
+from ..constants import AQIColumns, AQIRanges
+from ..metrics import instrumented
+from .pivot import DAY_LABELS, month_boundaries, pivot_day_of_year
+from .render_cache import RenderCache, render_key
+from .utils import fa, fa_num, load_fonts, shaping_stats
+
+REPORT_COLUMNS = AQIColumns.REPORT
+
+# Bump when a change here alters the rendered image, to invalidate cached plots
+RENDER_VERSION = "2"
 
 
 class AQIYearlyTrendVisualizer:
@@ -18,6 +28,20 @@ class AQIYearlyTrendVisualizer:
         )
         mpl.rcParams["font.family"] = self.regular_font.get_name()
         config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        self.render_cache = RenderCache(config.PLOTS_DIR)
+        self.warm_label_cache()
+
+    def warm_label_cache(self) -> None:
+        # Labels shared by every chart are shaped up front; the shaping
+        # helpers are cached, so warming again is only lookups. Year labels
+        # depend on the data and are shaped on first use
+        for month in range(1, 13):
+            for day in range(1, 32):
+                fa_num(f"{month:02d}/{day:02d}")
+        for start, end, _, label in AQIRanges.RANGES:
+            self.format_aqi_range_label(label, start, end)
+        fa("تاریخ (ماه/روز)")
+        fa("شاخص آلودگی هوا")
 
     def format_aqi_range_label(self, label: str, start: int, end: int) -> str:
         return fa(f"{label}\n({fa_num(start)}–{fa_num(end)})")
@@ -39,8 +63,8 @@ class AQIYearlyTrendVisualizer:
         self,
         ax: plt.Axes,
         pivot_df: pd.DataFrame,
-        year: str,
-        latest_year: str,
+        year: int,
+        latest_year: int,
         color_shade: float,
     ) -> None:
         is_latest = year == latest_year
@@ -90,7 +114,7 @@ class AQIYearlyTrendVisualizer:
     ) -> None:
         logger.debug(f"Starting AQI yearly comparison chart for {region}")
 
-        df = df[df["region_name_en"] == region].copy()
+        df = df[df["region_name_en"] == region]
         if df.empty:
             logger.warning(f"No data found for region: {region}")
             return
@@ -100,15 +124,43 @@ class AQIYearlyTrendVisualizer:
             logger.warning("Pivot table is empty")
             return
 
+        cache_key = render_key(
+            pivot_df,
+            self.dpi,
+            (self.config.FONT_REGULAR_PATH, self.config.FONT_BOLD_PATH),
+            RENDER_VERSION,
+            extra=(
+                df["region_name_fa"].iloc[0],
+                df[date_col].min(),
+                df[date_col].max(),
+            ),
+        )
+        output_path = self.get_output_path(region)
+        if self.render_cache.lookup(region.lower(), cache_key, output_path):
+            logger.info(f"Plot unchanged, skipping render: {output_path}")
+            return
+
+        shaping_before = shaping_stats()
         fig = self.create_trend_plot(df, pivot_df, date_col)
         self.save_trend_plot(fig, region)
+        self.render_cache.store(region.lower(), cache_key, output_path)
+
+        total = shaping_stats()
+        shaping = total.since(shaping_before)
+        saved_ms = shaping.hits * total.average_miss_seconds * 1000
+        logger.debug(
+            f"Text shaping for {region}: {shaping.hits} cached, "
+            f"{shaping.misses} shaped, ~{saved_ms:.1f} ms saved"
+        )
 
     def prepare_trend_data(
         self, df: pd.DataFrame, date_col: str, aqi_col: str
     ) -> pd.DataFrame:
-        df[["year", "month_day"]] = df[date_col].str.split("/", n=1, expand=True)
-        return df.pivot(index="month_day", columns="year", values=aqi_col).sort_index()
+        return pivot_day_of_year(
+            df, date_col, aqi_col, aggfunc=self.config.TREND_AGGREGATION
+        )
 
+    @instrumented("create_trend_plot")
     def create_trend_plot(
         self, df: pd.DataFrame, pivot_df: pd.DataFrame, date_col: str
     ) -> plt.Figure:
@@ -165,10 +217,8 @@ class AQIYearlyTrendVisualizer:
         )
 
     def configure_axis_ticks(self, ax: plt.Axes, pivot_df: pd.DataFrame) -> None:
-        tick_positions = [
-            i for i, val in enumerate(pivot_df.index) if val.endswith("/01")
-        ]
-        tick_labels = [fa_num(pivot_df.index[i]) for i in tick_positions]
+        tick_positions = month_boundaries(pivot_df.index)
+        tick_labels = [fa_num(label) for label in DAY_LABELS[tick_positions]]
 
         ax.set_xticks(tick_positions)
         ax.set_xticklabels(
@@ -189,11 +239,13 @@ class AQIYearlyTrendVisualizer:
             fontproperties=self.config.FONT_REGULAR_PATH,
         )
 
+    def get_output_path(self, region: str) -> Path:
+        return self.config.PLOTS_DIR / f"aqi_yearly_comparison_{region.lower()}.png"
+
+    @instrumented("save_trend_plot")
     def save_trend_plot(self, fig: plt.Figure, region: str) -> None:
         self.config.PLOTS_DIR.mkdir(parents=True, exist_ok=True)
-        output_path = (
-            self.config.PLOTS_DIR / f"aqi_yearly_comparison_{region.lower()}.png"
-        )
+        output_path = self.get_output_path(region)
         fig.savefig(output_path, dpi=self.dpi)
         plt.close(fig)
         logger.success(f"Plot saved successfully: {output_path}")